@@ -0,0 +1,87 @@
+"""Доля попаданий в кеш при нескольких процессах-воркерах.
+
+    python benchmarks/bench_cache.py --workers 4
+    python benchmarks/bench_cache.py --backends file,file+local,db
+
+Каждый воркер имитирует процесс gunicorn: запрашивает страницы
+с распределением Ципфа и на промахе «рендерит» и кладёт страницу
+в кеш. С ``locmem`` у каждого процесса своя копия кеша, и каждый
+воркер заново промахивается по тем же страницам.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from common import print_table, setup_django
+
+PAGE = 'x' * 20000
+
+
+def worker(args):
+    seed, keys, requests, render_ms = args
+    setup_django(migrate=False)
+    from django.core.cache import cache
+
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    population = [f'bench:page:{rank}' for rank in range(keys)]
+    hits = 0
+    started = time.perf_counter()
+    for key in rng.choices(population, weights, k=requests):
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            time.sleep(render_ms / 1000)
+            cache.set(key, PAGE, 600)
+    return hits, time.perf_counter() - started
+
+
+def prepare():
+    """Создаёт таблицу кеша и очищает кеш перед прогоном."""
+    setup_django()
+    from django.core.cache import caches
+    from django.core.management import call_command
+    call_command('createcachetable', verbosity=0)
+    caches['default'].clear()
+
+
+def run(backend, workers, keys, requests, render_ms):
+    name, _, local = backend.partition('+')
+    os.environ['YATUBE_CACHE'] = name
+    os.environ['YATUBE_CACHE_LOCAL'] = '1' if local else '0'
+    # Настройки Django читаются один раз на процесс, поэтому каждая
+    # конфигурация кеша готовится и гоняется в новых процессах.
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=prepare)
+    process.start()
+    process.join()
+    with context.Pool(workers) as pool:
+        results = pool.map(worker, [(seed, keys, requests, render_ms)
+                                    for seed in range(workers)])
+    hits = sum(result[0] for result in results)
+    elapsed = max(result[1] for result in results)
+    total = workers * requests
+    return (backend, workers, f'{hits / total * 100:.1f}%',
+            f'{total / elapsed:.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backends', default='locmem,file,file+local,db')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--render-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    rows = []
+    for backend in args.backends.split(','):
+        rows.append(run(backend, args.workers, args.keys, args.requests,
+                        args.render_ms))
+    print_table(('кеш', 'воркеров', 'hit rate', 'запросов/с'), rows)
+
+
+if __name__ == '__main__':
+    main()
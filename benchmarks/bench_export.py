@@ -0,0 +1,78 @@
+"""Пик памяти при выгрузке данных пользователя.
+
+    python benchmarks/bench_export.py --posts 20000 100000 400000
+
+Все посты принадлежат одному автору, выгрузка пишется в /dev/null.
+``posts.export`` читает базу ``iterator(chunk_size=...)``
+и сравнивается с наивной выгрузкой, которая собирает все строки
+в список и сериализует его целиком. Каждая выгрузка идёт
+в отдельном процессе; пик памяти — рост ``VmHWM`` процесса (Linux).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from common import print_table, seed_posts, setup_django
+
+DB_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'bench_export.sqlite3')
+
+
+def memory_kb(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def run(method, export_format):
+    """Выгружает данные автора; выполняется в отдельном процессе."""
+    setup_django(DB_NAME, migrate=False)
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from posts import export
+    from posts.models import Post
+
+    user = Post.objects.first().author
+    baseline = memory_kb('VmRSS')
+    started = time.perf_counter()
+    with open(os.devnull, 'wb') as output:
+        if method == 'поток':
+            for chunk in export.export_chunks(user, export_format):
+                output.write(
+                    chunk.encode() if isinstance(chunk, str) else chunk)
+        else:
+            rows = list(Post.objects.filter(author=user).values(
+                'id', 'text', 'pub_date', 'group__slug', 'image',
+                'comments_count'))
+            output.write(json.dumps(rows, cls=DjangoJSONEncoder,
+                                    ensure_ascii=False).encode())
+    elapsed = time.perf_counter() - started
+    return elapsed, (memory_kb('VmHWM') - baseline) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, nargs='+',
+                        default=[20000, 100000, 400000])
+    args = parser.parse_args()
+
+    setup_django(DB_NAME)
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for total in sorted(args.posts):
+        seed_posts(total, authors=1)
+        for method, export_format in (('поток', 'ndjson'), ('поток', 'csv'),
+                                      ('список', 'json')):
+            with context.Pool(1) as pool:
+                elapsed, peak = pool.apply(run, (method, export_format))
+            rows.append((total, method, export_format, f'{elapsed:.2f}',
+                         f'{peak:.1f}'))
+    print_table(('постов', 'выгрузка', 'формат', 'время, с',
+                 'пик памяти, МБ'), rows)
+
+
+if __name__ == '__main__':
+    main()
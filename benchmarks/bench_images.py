@@ -0,0 +1,147 @@
+"""Размер хранилища, трафик и память при создании вариантов картинок.
+
+    python benchmarks/bench_images.py --images 5 --size 4000x3000
+
+Синтетические JPEG-фотографии режутся во все варианты из
+``posts.thumbnails.THUMBNAIL_SIZES`` двумя движками: стандартным
+PIL-движком sorl (полное декодирование) и ``DraftEngine``
+(декодирование в уменьшенном масштабе). Каждый движок работает
+в отдельном процессе; пик памяти — рост ``VmHWM`` процесса (Linux).
+
+Трафик считается для типичных экранов: браузер берёт из ``srcset``
+самый узкий вариант не уже ``min(ширина экрана, 960) × DPR``.
+Раньше всем отдавался один кадр 960x339.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from common import print_table, setup_django
+
+ENGINES = {
+    'sorl pil': 'sorl.thumbnail.engines.pil_engine.Engine',
+    'draft': 'posts.thumbnails.DraftEngine',
+}
+CLIENTS = (
+    ('телефон 320 @1x', 320, 1),
+    ('телефон 360 @2x', 360, 2),
+    ('телефон 412 @2.6x', 412, 2.6),
+    ('планшет 768 @1x', 768, 1),
+    ('ноутбук 1366 @1x', 1366, 1),
+)
+
+
+def memory_kb(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def make_photos(directory, count, width, height):
+    from PIL import Image
+
+    names = []
+    for index in range(count):
+        # Градиенты с шумом сжимаются примерно как фотографии.
+        gradient = Image.linear_gradient('L').resize((width, height))
+        noise = Image.effect_noise((width, height), 48 + index)
+        photo = Image.merge('RGB', (
+            gradient, noise,
+            gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+        name = f'posts/bench_{index}.jpg'
+        os.makedirs(os.path.join(directory, 'posts'), exist_ok=True)
+        photo.save(os.path.join(directory, name), 'JPEG', quality=90)
+        names.append(name)
+    return names
+
+
+def generate(engine, media_root, names):
+    """Создаёт все варианты картинок; выполняется в отдельном процессе."""
+    setup_django(migrate=False)
+    from django.conf import settings
+    settings.MEDIA_ROOT = media_root
+    settings.THUMBNAIL_ENGINE = ENGINES[engine]
+    settings.THUMBNAIL_PREFIX = f'cache-{engine.replace(" ", "-")}/'
+    from sorl.thumbnail import default
+
+    from posts import thumbnails
+
+    default.kvstore.clear()
+    baseline = memory_kb('VmRSS')
+    sizes = {}
+    started = time.perf_counter()
+    for name in names:
+        for geometry, options in thumbnails.THUMBNAIL_SIZES:
+            thumbnail = default.backend.generate(name, geometry, **options)
+            key = (options.get('format'), thumbnail.width)
+            sizes[key] = sizes.get(key, 0) + default.storage.size(
+                thumbnail.name)
+    elapsed = time.perf_counter() - started
+    peak = memory_kb('VmHWM')
+    return sizes, elapsed / len(names), (peak - baseline) / 1024
+
+
+def served(sizes, image_format, viewport, dpr):
+    widths = sorted(width for fmt, width in sizes if fmt == image_format)
+    needed = min(viewport, 960) * dpr
+    width = next((width for width in widths if width >= needed), widths[-1])
+    return sizes[(image_format, width)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--size', default='4000x3000')
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split('x'))
+
+    setup_django()
+    media_root = tempfile.mkdtemp(prefix='bench_images_')
+    try:
+        names = make_photos(media_root, args.images, width, height)
+        original = sum(os.path.getsize(os.path.join(media_root, name))
+                       for name in names)
+        context = multiprocessing.get_context('spawn')
+        results = {}
+        for engine in ENGINES:
+            with context.Pool(1) as pool:
+                results[engine] = pool.apply(generate,
+                                             (engine, media_root, names))
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    print(f'Картинок: {args.images}, {args.size}')
+    print_table(
+        ('движок', 'мс на картинку', 'пик памяти, МБ'),
+        [(engine, f'{elapsed * 1000:.0f}', f'{peak:.0f}')
+         for engine, (_, elapsed, peak) in results.items()])
+
+    sizes = results['draft'][0]
+    formats = sorted({fmt for fmt, _ in sizes}, key=str)
+    print()
+    print_table(
+        ('хранится', 'КБ на картинку'),
+        [('оригинал', f'{original / args.images / 1024:.0f}')]
+        + [(f'{fmt or "JPEG"} {width}w', f'{size / args.images / 1024:.0f}')
+           for (fmt, width), size in sorted(sizes.items(), key=str)])
+
+    print()
+    rows = []
+    for title, viewport, dpr in CLIENTS:
+        row = [title,
+               f'{sizes[(None, 960)] / args.images / 1024:.0f}']
+        for fmt in formats:
+            total = served(sizes, fmt, viewport, dpr)
+            row.append(f'{total / args.images / 1024:.0f}')
+        rows.append(row)
+    print_table(('экран', 'было, КБ')
+                + tuple(f'srcset {fmt or "JPEG"}, КБ' for fmt in formats),
+                rows)
+
+
+if __name__ == '__main__':
+    main()
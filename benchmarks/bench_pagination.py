@@ -0,0 +1,61 @@
+"""Сравнение OFFSET-пагинации и курсорной пагинации главной ленты.
+
+    python benchmarks/bench_pagination.py --posts 1000000 --page 10000
+
+Для каждой глубины страницы измеряется время получения страницы
+старым ``Paginator`` (COUNT(*) + OFFSET) и ``CursorPaginator``.
+"""
+import argparse
+
+from common import measure, print_table, seed_posts, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_posts(args.posts)
+
+    from django.core.paginator import Paginator
+
+    from core.pagination import CursorPaginator
+    from posts.models import Post
+    from posts.views import POST_PER_PAGE
+
+    posts = Post.objects.select_related('author', 'group')
+
+    def offset_page(number):
+        paginator = Paginator(posts.order_by('-pub_date', '-id'),
+                              POST_PER_PAGE)
+        return lambda: list(paginator.get_page(number))
+
+    def cursor_for(number):
+        """Курсор, указывающий на страницу ``number`` ленты."""
+        paginator = CursorPaginator(posts, POST_PER_PAGE)
+        anchor = paginator.object_list[(number - 1) * POST_PER_PAGE - 1]
+        return paginator.encode_cursor(anchor, 'n', number)
+
+    def cursor_page(cursor):
+        return lambda: list(
+            CursorPaginator(posts, POST_PER_PAGE).get_page(cursor=cursor))
+
+    deep_cursor = cursor_for(args.page)
+    rows = []
+    for title, func in (
+        ('offset, стр. 1', offset_page(1)),
+        (f'offset, стр. {args.page}', offset_page(args.page)),
+        ('cursor, стр. 1', cursor_page(None)),
+        (f'cursor, стр. {args.page}', cursor_page(deep_cursor)),
+    ):
+        median, p95 = measure(func, args.repeat)
+        rows.append((title, f'{median:.2f}', f'{p95:.2f}'))
+    print(f'Постов в базе: {Post.objects.count()}')
+    print_table(('страница', 'медиана, мс', 'p95, мс'), rows)
+
+
+if __name__ == '__main__':
+    main()
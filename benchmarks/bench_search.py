@@ -0,0 +1,116 @@
+"""Поиск по индексу против ``icontains`` на большой таблице постов.
+
+    python benchmarks/bench_search.py --posts 1000000
+    python benchmarks/bench_search.py --posts 100000 --inverted
+
+Тексты постов собираются из словаря с распределением Ципфа, поэтому
+в запросах есть и частые, и редкие слова. Для каждого запроса
+измеряется первая страница выдачи вместе с подсчётом результатов:
+сканирование ``text__icontains`` (как в поиске админки), FTS5
+и, с ``--inverted``, обратный индекс ``SearchEntry``.
+"""
+import argparse
+import os
+import random
+import time
+
+from common import ROOT_DIR, measure, print_table, seed_posts, setup_django
+
+SEARCH_DB = os.path.join(ROOT_DIR, 'benchmarks', 'bench_search.sqlite3')
+SYLLABLES = ('ка', 'ло', 'ми', 'ра', 'ну', 'те', 'во', 'сы', 'да', 'же',
+             'по', 'ри', 'мо', 'ле', 'ша', 'гу')
+
+
+def vocabulary(size, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES)
+                          for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_indexes(inverted):
+    from django.conf import settings
+
+    from posts import search
+    from posts.models import SearchEntry
+
+    backends = ['auto'] + (['python'] if inverted else [])
+    for backend in backends:
+        settings.SEARCH_BACKEND = backend
+        if backend == 'python' and SearchEntry.objects.exists():
+            continue
+        started = time.perf_counter()
+        search.rebuild()
+        print(f'индекс {backend}: построен за '
+              f'{time.perf_counter() - started:.1f} с')
+
+
+def scan(query):
+    """Поиск админки: каждое слово — отдельный LIKE по всей таблице."""
+    from django.core.paginator import Paginator
+
+    from posts.models import Post
+    from posts.views import POST_PER_PAGE
+
+    posts = Post.objects.order_by('-pub_date')
+    for word in query.split():
+        posts = posts.filter(text__icontains=word)
+    return lambda: list(Paginator(posts, POST_PER_PAGE).get_page(1))
+
+
+def indexed(query, backend):
+    from django.conf import settings
+    from django.core.paginator import Paginator
+
+    from posts import search
+    from posts.views import POST_PER_PAGE
+
+    def run():
+        settings.SEARCH_BACKEND = backend
+        return list(Paginator(search.SearchResults(query),
+                              POST_PER_PAGE).get_page(1))
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--inverted', action='store_true',
+                        help='построить и измерить обратный индекс')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    words = vocabulary(args.words)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    def make_text(number, rng):
+        return ' '.join(rng.choices(words, weights, k=rng.randint(8, 30)))
+
+    setup_django(SEARCH_DB)
+    seed_posts(args.posts, make_text=make_text)
+    build_indexes(args.inverted)
+
+    from posts import search
+    from posts.models import Post
+
+    queries = (words[0], words[50], words[-1], f'{words[0]} {words[-1]}')
+    rows = []
+    for query in queries:
+        found = search.SearchResults(query).count()
+        methods = [('icontains', scan(query)),
+                   ('fts5', indexed(query, 'auto'))]
+        if args.inverted:
+            methods.append(('обратный индекс', indexed(query, 'python')))
+        for title, func in methods:
+            median, p95 = measure(func, args.repeat)
+            rows.append((query, found, title, f'{median:.2f}', f'{p95:.2f}'))
+    print(f'Постов в базе: {Post.objects.count()}')
+    print_table(('запрос', 'найдено', 'способ', 'медиана, мс', 'p95, мс'),
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Пропускная способность профилей настроек dev и prod.
+
+    python benchmarks/bench_settings.py --duration 10
+    python benchmarks/bench_settings.py --cache   # с кешем лент
+
+Каждый профиль работает в своём процессе на одной и той же базе
+(``benchmarks/bench_settings.sqlite3``, заполняется ``manage.py seed``)
+и последовательно запрашивает страницы через полный стек Django:
+middleware, представления, шаблоны. По умолчанию кеш отключён
+(DummyCache), чтобы каждая страница отрисовывалась заново; запросы идут
+с cookie, минуя быстрый путь анонимных лент.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from common import ROOT_DIR, print_table, setup_django
+
+DB_NAME = os.path.join(ROOT_DIR, 'benchmarks', 'bench_settings.sqlite3')
+
+
+def prepare(posts):
+    setup_django(DB_NAME)
+    from django.core.management import call_command
+
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed', users=200, groups=10, posts=posts,
+                     comments=posts * 2, follows=10, images=0,
+                     image_files=0)
+
+
+def paths(rng):
+    """Страницы вперемешку, как у читателя: ленты, профили, посты."""
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Group, Post
+
+    post_ids = list(Post.objects.values_list('id', flat=True)[:200])
+    usernames = list(get_user_model().objects.values_list(
+        'username', flat=True)[:50])
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    return [
+        lambda: '/',
+        lambda: f'/?page={rng.randint(1, 5)}',
+        lambda: f'/group/{rng.choice(slugs)}/',
+        lambda: f'/profile/{rng.choice(usernames)}/',
+        lambda: f'/posts/{rng.choice(post_ids)}/',
+        lambda: '/about/author/',
+    ]
+
+
+def run(args):
+    profile, duration, use_cache = args
+    os.environ.setdefault('YATUBE_SECRET_KEY', 'bench-' + 'x' * 50)
+    static_root = tempfile.mkdtemp()
+    setup_django(DB_NAME, migrate=False, profile=profile)
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import Client
+
+    if not use_cache:
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    if profile == 'prod':
+        # Манифест статики нужен до первой страницы с {% static %}.
+        settings.STATIC_ROOT = static_root
+        call_command('collectstatic', interactive=False, verbosity=0)
+    rng = random.Random(0)
+    pages = paths(rng)
+    client = Client()
+    client.cookies['bench'] = '1'
+    timings = []
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < duration:
+            path = rng.choice(pages)()
+            request_started = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise SystemExit(f'{path}: статус {response.status_code}')
+    finally:
+        shutil.rmtree(static_root, ignore_errors=True)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return (profile, len(timings), f'{len(timings) / elapsed:.0f}',
+            f'{statistics.median(timings) * 1000:.2f}',
+            f'{timings[int(len(timings) * 0.95) - 1] * 1000:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', default='dev,prod')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Секунд на профиль.')
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--cache', action='store_true',
+                        help='Не отключать кеш лент и карточек.')
+    args = parser.parse_args()
+
+    # Настройки читаются один раз на процесс: каждый профиль — в новом.
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=prepare, args=(args.posts,))
+    process.start()
+    process.join()
+    rows = []
+    for profile in args.profiles.split(','):
+        with context.Pool(1) as pool:
+            rows.append(pool.apply(run, ((profile, args.duration,
+                                          args.cache),)))
+    print_table(('профиль', 'запросов', 'запросов/с', 'p50, мс', 'p95, мс'),
+                rows)
+
+
+if __name__ == '__main__':
+    main()
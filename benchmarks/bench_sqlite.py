@@ -0,0 +1,153 @@
+"""Читатели и писатели SQLite в разных процессах: с PRAGMA и без.
+
+    python benchmarks/bench_sqlite.py --readers 6 --writers 3 --duration 15
+
+Режим ``default`` — настройки SQLite по умолчанию (журнал DELETE,
+без SQLITE_PRAGMAS), ``tuned`` — ``SQLITE_PRAGMAS`` из настроек.
+Читатели запрашивают ленту, посты и профили, писатели по кругу
+публикуют пост, комментируют и подписываются — через полный стек
+Django на одной базе (``benchmarks/bench_sqlite.sqlite3``). Кеш
+отключён, чтобы каждый запрос шёл в базу. Ошибка — исключение,
+обычно «database is locked».
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import time
+
+from common import ROOT_DIR, print_table, setup_django
+
+DB_NAME = os.path.join(ROOT_DIR, 'benchmarks', 'bench_sqlite.sqlite3')
+
+
+def setup(mode):
+    setup_django(DB_NAME, migrate=False)
+    from django.conf import settings
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    if mode == 'default':
+        settings.SQLITE_PRAGMAS = {}
+
+
+def prepare(mode, posts):
+    setup_django(DB_NAME)
+    from django.core.management import call_command
+    from django.db import connection
+
+    from posts.models import Post
+    if not Post.objects.exists():
+        call_command('seed', users=200, groups=10, posts=posts,
+                     comments=posts * 2, follows=10, images=0,
+                     image_files=0)
+    # Режим журнала хранится в файле базы: для default его нужно вернуть.
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode = '
+                       + ('delete' if mode == 'default' else 'wal'))
+
+
+def worker(args):
+    mode, role, number, duration, barrier = args
+    setup(mode)
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError
+    from django.test import Client
+
+    from posts.models import Post
+
+    User = get_user_model()
+    rng = random.Random(number)
+    post_ids = list(Post.objects.values_list('id', flat=True)[:500])
+    usernames = list(User.objects.values_list('username', flat=True)[:100])
+    client = Client()
+    if role == 'writer':
+        user = User.objects.get(username=f'seed_{number}')
+        client.force_login(user)
+        author = rng.choice([name for name in usernames
+                             if name != user.username])
+        actions = [
+            lambda: client.post('/create/', {'text': 'Пост под нагрузкой'}),
+            lambda: client.post(f'/posts/{rng.choice(post_ids)}/comment/',
+                                {'text': 'Комментарий под нагрузкой'}),
+            lambda: client.get(f'/profile/{author}/follow/'),
+            lambda: client.get(f'/profile/{author}/unfollow/'),
+        ]
+    else:
+        client.cookies['bench'] = '1'
+        actions = [
+            lambda: client.get('/'),
+            lambda: client.get(f'/posts/{rng.choice(post_ids)}/'),
+            lambda: client.get(f'/profile/{rng.choice(usernames)}/'),
+        ]
+    timings = []
+    errors = 0
+    barrier.wait()
+    started = time.perf_counter()
+    step = 0
+    while time.perf_counter() - started < duration:
+        action = (actions[step % len(actions)] if role == 'writer'
+                  else rng.choice(actions))
+        step += 1
+        request_started = time.perf_counter()
+        try:
+            action()
+        except OperationalError:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - request_started)
+    return role, timings, errors, time.perf_counter() - started
+
+
+def percentile(timings, share):
+    if not timings:
+        return '-'
+    return f'{timings[max(int(len(timings) * share) - 1, 0)] * 1000:.1f}'
+
+
+def run(mode, readers, writers, duration, posts):
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=prepare, args=(mode, posts))
+    process.start()
+    process.join()
+    manager = context.Manager()
+    barrier = manager.Barrier(readers + writers)
+    tasks = ([(mode, 'reader', number, duration, barrier)
+              for number in range(readers)]
+             + [(mode, 'writer', number, duration, barrier)
+                for number in range(writers)])
+    with context.Pool(readers + writers) as pool:
+        results = pool.map(worker, tasks)
+    manager.shutdown()
+    rows = []
+    for role in ('reader', 'writer'):
+        timings = sorted(timing for result in results if result[0] == role
+                         for timing in result[1])
+        errors = sum(result[2] for result in results if result[0] == role)
+        elapsed = max(result[3] for result in results if result[0] == role)
+        rows.append((
+            mode, role, f'{len(timings) / elapsed:.0f}',
+            f'{statistics.median(timings) * 1000:.1f}' if timings else '-',
+            percentile(timings, 0.95), percentile(timings, 0.99), errors))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modes', default='default,tuned')
+    parser.add_argument('--readers', type=int, default=6)
+    parser.add_argument('--writers', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--posts', type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = []
+    for mode in args.modes.split(','):
+        rows.extend(run(mode, args.readers, args.writers, args.duration,
+                        args.posts))
+    print_table(('режим', 'роль', 'запросов/с', 'p50, мс', 'p95, мс',
+                 'p99, мс', 'ошибок'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Общие помощники для бенчмарков.
+
+Бенчмарки запускаются из корня репозитория, например::
+
+    python benchmarks/bench_pagination.py --posts 1000000
+
+Каждый скрипт работает с отдельной SQLite-базой (по умолчанию
+``benchmarks/bench.sqlite3``) и не трогает базу разработки.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'yatube')
+DEFAULT_DB = os.path.join(ROOT_DIR, 'benchmarks', 'bench.sqlite3')
+
+
+def setup_django(db_name=DEFAULT_DB, migrate=True, profile=None):
+    """Настраивает Django на отдельную базу и накатывает миграции.
+
+    ``profile`` — профиль настроек (YATUBE_PROFILE) со своим DEBUG;
+    без него DEBUG выключается.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    if profile is not None:
+        os.environ['YATUBE_PROFILE'] = profile
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_name
+    if profile is None:
+        settings.DEBUG = False
+
+    import django
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def seed_posts(total, authors=100, groups=10, batch=50000, make_text=None):
+    """Быстро заполняет posts_post сырым SQL (сигналы не вызываются).
+
+    ``make_text(number, rng)`` возвращает текст поста. Если в таблице
+    уже есть ``total`` постов, ничего не делает.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    from posts.models import Group, Post
+
+    User = get_user_model()
+    existing = Post.objects.count()
+    if existing >= total:
+        return
+    author_ids = list(User.objects.values_list('id', flat=True)[:authors])
+    for index in range(len(author_ids), authors):
+        author_ids.append(
+            User.objects.create(username=f'bench_user_{index}').id)
+    group_ids = list(Group.objects.values_list('id', flat=True)[:groups])
+    for index in range(len(group_ids), groups):
+        group_ids.append(Group.objects.create(
+            title=f'Группа {index}', slug=f'bench-group-{index}',
+            description='').id)
+
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    table = Post._meta.db_table
+    sql = (f'INSERT INTO {table} '
+           f'(text, pub_date, author_id, group_id, image, comments_count) '
+           f'VALUES (%s, %s, %s, %s, %s, 0)')
+    rng = random.Random(existing)
+    if make_text is None:
+        def make_text(number, rng):
+            return f'Пост номер {number}'
+    for offset in range(existing, total, batch):
+        rows = [
+            (make_text(number, rng), start + timedelta(seconds=number),
+             rng.choice(author_ids), rng.choice(group_ids), '')
+            for number in range(offset, min(offset + batch, total))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        print(f'  создано постов: {min(offset + batch, total)}/{total}',
+              file=sys.stderr)
+
+
+def measure(func, repeat=20):
+    """Медиана и p95 времени вызова ``func`` в миллисекундах."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def print_table(header, rows):
+    widths = [max(len(str(row[i])) for row in [header] + rows)
+              for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width)
+                        for cell, width in zip(row, widths)))
@@ -0,0 +1,282 @@
+"""Нагрузочный тест всех страниц posts.urls и users.urls.
+
+    cd yatube && python manage.py seed
+    gunicorn yatube.wsgi -w 4        # или python manage.py runserver
+    python benchmarks/loadtest.py --clients 16 --duration 60
+
+Идентификаторы постов, имена пользователей и группы берутся из базы
+проекта (``--db``), поэтому сервер должен работать с той же базой.
+Каждый клиент — отдельный поток со своей сессией: он входит под
+пользователем ``seed_*`` и случайно обходит страницы с весами из
+``SCENARIOS``. Редиректы не отслеживаются: одно измерение — один
+HTTP-запрос. Ошибка — исключение или ответ со статусом 400 и выше.
+"""
+import argparse
+import math
+import random
+import re
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from common import PROJECT_DIR, print_table, setup_django
+
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def load_data(sample):
+    """Случайная выборка объектов базы, к которым обращаются клиенты."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+
+    from posts.management.commands.seed import SEED_PASSWORD
+    from posts.models import Group, Post
+    from posts.search import tokenize
+
+    User = get_user_model()
+    post_ids = list(Post.objects.order_by('?').values_list(
+        'id', flat=True)[:sample])
+    if not post_ids:
+        raise SystemExit('В базе нет постов: выполните manage.py seed')
+    authors = User.objects.filter(username__startswith='seed_').annotate(
+        post_count=Count('posts')).filter(
+            post_count__gt=0).order_by('?')[:sample]
+    own_posts = {}
+    for author in authors:
+        own_posts[author.username] = list(Post.objects.filter(
+            author=author).values_list('id', flat=True)[:20])
+    if not own_posts:
+        raise SystemExit('Нет авторов seed_*: выполните manage.py seed')
+    words = {word for text in Post.objects.filter(id__in=post_ids[:100])
+             .values_list('text', flat=True) for word in tokenize(text)}
+    return {
+        'post_ids': post_ids,
+        'own_posts': own_posts,
+        'usernames': list(User.objects.order_by('?').values_list(
+            'username', flat=True)[:sample]),
+        'groups': list(Group.objects.values_list('slug', 'id')[:sample]),
+        'words': sorted(words),
+        'password': SEED_PASSWORD,
+    }
+
+
+class Client:
+    def __init__(self, base_url, data, rng, record):
+        self.base_url = base_url
+        self.data = data
+        self.rng = rng
+        self.record = record
+        self.session = requests.Session()
+        self.username = rng.choice(list(data['own_posts']))
+
+    def request(self, route, method, path, **kwargs):
+        url = urljoin(self.base_url, path)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=30,
+                                            allow_redirects=False, **kwargs)
+        except requests.RequestException:
+            self.record(route, time.perf_counter() - started, None)
+            return None
+        self.record(route, time.perf_counter() - started,
+                    response.status_code)
+        return response
+
+    def get(self, route, path, **kwargs):
+        return self.request(route, 'GET', path, **kwargs)
+
+    def post(self, route, path, form_route, form_path, data):
+        """Отправляет форму с CSRF-токеном со страницы ``form_path``."""
+        response = self.get(form_route, form_path)
+        token = response is not None and CSRF_RE.search(response.text)
+        if not token:
+            return None
+        return self.request(route, 'POST', path, data={
+            **data, 'csrfmiddlewaretoken': token.group(1)})
+
+    def login(self):
+        self.post('users:login (POST)', '/auth/login/',
+                  'users:login', '/auth/login/',
+                  {'username': self.username,
+                   'password': self.data['password']})
+
+    def post_id(self):
+        return self.rng.choice(self.data['post_ids'])
+
+    def own_post_id(self):
+        return self.rng.choice(self.data['own_posts'][self.username])
+
+    def other_username(self):
+        return self.rng.choice(self.data['usernames'])
+
+    # Сценарии: каждый обходит одну-две страницы.
+
+    def index(self):
+        page = self.rng.choice((1, 1, 1, 2, 3))
+        self.get('posts:index', f'/?page={page}')
+
+    def group_list(self):
+        if self.data['groups']:
+            slug, _ = self.rng.choice(self.data['groups'])
+            self.get('posts:group_list', f'/group/{slug}/')
+
+    def search(self):
+        if self.data['words']:
+            words = self.rng.sample(self.data['words'],
+                                    min(len(self.data['words']),
+                                        self.rng.randint(1, 2)))
+            self.get('posts:search', '/search/',
+                     params={'q': ' '.join(words)})
+
+    def profile(self):
+        self.get('posts:profile', f'/profile/{self.other_username()}/')
+
+    def post_detail(self):
+        self.get('posts:post_detail', f'/posts/{self.post_id()}/')
+
+    def follow_index(self):
+        self.get('posts:follow_index', '/follow/')
+
+    def post_create(self):
+        data = {'text': f'Нагрузочный пост {self.rng.random()}'}
+        if self.data['groups']:
+            data['group'] = self.rng.choice(self.data['groups'])[1]
+        self.post('posts:post_create (POST)', '/create/',
+                  'posts:post_create', '/create/', data)
+
+    def post_edit(self):
+        path = f'/posts/{self.own_post_id()}/edit/'
+        self.post('posts:post_edit (POST)', path, 'posts:post_edit', path,
+                  {'text': f'Отредактированный пост {self.rng.random()}'})
+
+    def add_comment(self):
+        post_id = self.post_id()
+        self.post('posts:add_comment', f'/posts/{post_id}/comment/',
+                  'posts:post_detail', f'/posts/{post_id}/',
+                  {'text': f'Нагрузочный комментарий {self.rng.random()}'})
+
+    def follow(self):
+        username = self.other_username()
+        self.get('posts:profile_follow', f'/profile/{username}/follow/')
+        self.get('posts:profile_unfollow', f'/profile/{username}/unfollow/')
+
+    def auth_pages(self):
+        path, route = self.rng.choice((
+            ('/auth/signup/', 'users:signup'),
+            ('/auth/login/', 'users:login'),
+            ('/auth/password_change/', 'users:password_change_form'),
+            ('/auth/password_change/done/', 'users:password_change_done'),
+            ('/auth/password_reset/', 'users:password_reset_form'),
+            ('/auth/password_reset/done/', 'users:password_reset_done'),
+            ('/auth/reset/MQ/set-password/',
+             'users:password_reset_confirm'),
+            ('/auth/reset/done/', 'users:password_reset_complete'),
+        ))
+        self.get(route, path)
+
+    def relogin(self):
+        self.get('users:logout', '/auth/logout/')
+        self.login()
+
+
+# Веса сценариев: чтение преобладает, как на живом сайте.
+SCENARIOS = (
+    (Client.index, 30),
+    (Client.post_detail, 20),
+    (Client.profile, 10),
+    (Client.group_list, 8),
+    (Client.follow_index, 8),
+    (Client.search, 5),
+    (Client.auth_pages, 4),
+    (Client.add_comment, 3),
+    (Client.follow, 2),
+    (Client.post_create, 1),
+    (Client.post_edit, 1),
+    (Client.relogin, 1),
+)
+WRITES = {Client.add_comment, Client.follow, Client.post_create,
+          Client.post_edit}
+
+
+def run_client(base_url, data, seed, deadline, scenarios, record):
+    rng = random.Random(seed)
+    client = Client(base_url, data, rng, record)
+    client.login()
+    functions = [function for function, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+    while time.monotonic() < deadline:
+        rng.choices(functions, weights)[0](client)
+
+
+def percentiles(timings):
+    """p50, p95 и p99 методом ближайшего ранга по отсортированным."""
+    ordered = sorted(timings)
+    if not ordered:
+        return 0.0, 0.0, 0.0
+    return tuple(ordered[max(math.ceil(len(ordered) * share) - 1, 0)]
+                 for share in (0.50, 0.95, 0.99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000/')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Длительность в секундах.')
+    parser.add_argument('--db', default=f'{PROJECT_DIR}/db.sqlite3',
+                        help='База, с которой работает сервер.')
+    parser.add_argument('--sample', type=int, default=1000,
+                        help='Сколько постов и пользователей выбрать.')
+    parser.add_argument('--read-only', action='store_true',
+                        help='Не создавать постов, комментариев и подписок.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django(args.db, migrate=False)
+    data = load_data(args.sample)
+    scenarios = [(function, weight) for function, weight in SCENARIOS
+                 if not (args.read_only and function in WRITES)]
+
+    results = {}
+    lock = threading.Lock()
+
+    def record(route, duration, status):
+        with lock:
+            timings, errors = results.setdefault(route, ([], []))
+            timings.append(duration * 1000)
+            if status is None or status >= 400:
+                errors.append(status)
+
+    deadline = time.monotonic() + args.duration
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run_client, args=(
+        args.base_url, data, args.seed + number, deadline, scenarios,
+        record)) for number in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    rows = []
+    for route, (timings, errors) in sorted(results.items()):
+        p50, p95, p99 = percentiles(timings)
+        rows.append((route, len(timings), len(errors),
+                     f'{len(timings) / elapsed:.1f}',
+                     f'{p50:.1f}', f'{p95:.1f}', f'{p99:.1f}'))
+    everything = [timing for timings, _ in results.values()
+                  for timing in timings]
+    p50, p95, p99 = percentiles(everything)
+    rows.append(('всего', len(everything),
+                 sum(len(errors) for _, errors in results.values()),
+                 f'{len(everything) / elapsed:.1f}',
+                 f'{p50:.1f}', f'{p95:.1f}', f'{p99:.1f}'))
+    print(f'Клиентов: {args.clients}, {elapsed:.0f} с, {args.base_url}')
+    print_table(('страница', 'запросов', 'ошибок', 'rps',
+                 'p50, мс', 'p95, мс', 'p99, мс'), rows)
+
+
+if __name__ == '__main__':
+    main()
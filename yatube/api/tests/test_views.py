@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+import constants as c
+from core.tests.utils import RunOnCommitMixin
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(RunOnCommitMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=c.USERNAME_NOT_AUTHOR)
+        cls.group = Group.objects.create(
+            title=c.GROUP_TITLE, slug=c.GROUP_SLUG,
+            description=c.GROUP_DESCRIPTION)
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'{c.POST_TEXT} {number}')
+            for number in range(c.POSTS_PER_PAGE + 3)]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """Ленты отдают посты страницами по курсору."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', args=(c.GROUP_SLUG,)),
+            reverse('api:profile', args=(c.USERNAME_AUTHOR,)),
+            reverse('api:follow_index'),
+        )
+        self.client.force_login(self.reader)
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0], {
+                    'id': self.posts[-1].id,
+                    'text': self.posts[-1].text,
+                    'pub_date': data['results'][0]['pub_date'],
+                    'author': c.USERNAME_AUTHOR,
+                    'group': c.GROUP_SLUG,
+                    'image': None,
+                    'comments_count': 0,
+                })
+                self.assertEqual(len(data['results']), c.POSTS_PER_PAGE)
+                self.assertIsNone(data['previous'])
+                data = self.client.get(data['next']).json()
+                self.assertEqual([post['id'] for post in data['results']],
+                                 [post.id for post in self.posts[2::-1]])
+                self.assertIsNone(data['next'])
+
+    def test_profile_and_post(self):
+        """Профиль и пост отдают автора, подписку и комментарии."""
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text=c.COMMENT_TEXT)
+        self.client.force_login(self.reader)
+        data = self.client.get(
+            reverse('api:profile', args=(c.USERNAME_AUTHOR,))).json()
+        self.assertEqual(data['author']['posts_count'], len(self.posts))
+        self.assertEqual(data['author']['followers_count'], 1)
+        self.assertTrue(data['following'])
+        data = self.client.get(
+            reverse('api:post_detail', args=(self.posts[0].id,))).json()
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual([comment['text'] for comment in data['results']],
+                         [c.COMMENT_TEXT])
+
+    def test_errors(self):
+        """Неизвестный объект — 404, лента подписок без входа — 401."""
+        for url, status in (
+            (reverse('api:profile', args=('nobody',)), 404),
+            (reverse('api:group_posts', args=('nothing',)), 404),
+            (reverse('api:post_detail', args=(0,)), 404),
+            (reverse('api:follow_index'), 401),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_conditional_get(self):
+        """Повторный опрос без изменений получает 304 без запросов
+        к базе, после нового поста — свежий ответ."""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text=c.POST_TEXT_NEW)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['text'],
+                         c.POST_TEXT_NEW)
@@ -0,0 +1,163 @@
+"""JSON API только для чтения: ленты, посты, группы и профили.
+
+Повторяет страницы ``posts.views``, но выбирает лишь нужные колонки
+через ``values()``. Страницы листаются курсором (``next``/``previous``),
+а ответы несут ``ETag`` и ``Last-Modified`` по версиям кеша: повторный
+опрос без изменений получает 304, не обращаясь к базе.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from core.conditional import versioned_condition
+from core.pagination import CursorPaginator
+from posts import timeline
+from posts.cache import (ALL_FEEDS_VERSION, GROUP_FEED_VERSION,
+                         INDEX_VERSION, POST_VERSION,
+                         follow_feed_version_keys, profile_feed_version)
+from posts.models import Comment, Follow, Group, Post
+from posts.views import COMMENTS_ORDERING, COMMENTS_PER_PAGE, get_page
+
+User = get_user_model()
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group__slug',
+               'image', 'comments_count')
+COMMENT_FIELDS = ('id', 'text', 'pub_date', 'author__username')
+AUTHOR_FIELDS = ('id', 'username', 'first_name', 'last_name',
+                 'stats__posts_count', 'stats__followers_count',
+                 'stats__following_count')
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def not_found():
+    return json_response({'detail': 'Не найдено.'}, HTTPStatus.NOT_FOUND)
+
+
+def api_login_required(view):
+    """Как ``login_required``, но отвечает 401 вместо редиректа."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response({'detail': 'Требуется авторизация.'},
+                                 HTTPStatus.UNAUTHORIZED)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def serialize_post(request, row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': request.build_absolute_uri(
+            default_storage.url(row['image'])) if row['image'] else None,
+        'comments_count': row['comments_count'],
+    }
+
+
+def serialize_comment(request, row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+    }
+
+
+def cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(f'{request.path}?cursor={cursor}')
+
+
+def page_response(request, page, serialize, **extra):
+    return json_response({
+        **extra,
+        'results': [serialize(request, row) for row in page],
+        'next': cursor_url(request, page.next_cursor),
+        'previous': cursor_url(request, page.previous_cursor),
+    })
+
+
+@require_safe
+@versioned_condition(lambda request: [ALL_FEEDS_VERSION, INDEX_VERSION],
+                     per_user=False)
+def index(request):
+    page = get_page(request, Post.objects.values(*POST_FIELDS))
+    return page_response(request, page, serialize_post)
+
+
+@require_safe
+@versioned_condition(lambda request, slug: [
+    ALL_FEEDS_VERSION, GROUP_FEED_VERSION.format(slug)], per_user=False)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'title', 'slug', 'description').first()
+    if group is None:
+        return not_found()
+    page = get_page(request, Post.objects.filter(
+        group_id=group.pop('id')).values(*POST_FIELDS))
+    return page_response(request, page, serialize_post, group=group)
+
+
+@require_safe
+@versioned_condition(lambda request, username: [
+    ALL_FEEDS_VERSION, profile_feed_version(username)])
+def profile(request, username):
+    author = User.objects.filter(username=username).values(
+        *AUTHOR_FIELDS).first()
+    if author is None:
+        return not_found()
+    user = request.user
+    page = get_page(request, Post.objects.filter(
+        author_id=author['id']).values(*POST_FIELDS))
+    return page_response(
+        request, page, serialize_post,
+        author={
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'posts_count': author['stats__posts_count'] or 0,
+            'followers_count': author['stats__followers_count'] or 0,
+            'following_count': author['stats__following_count'] or 0,
+        },
+        following=user.is_authenticated and Follow.objects.filter(
+            user=user, author_id=author['id']).exists())
+
+
+@require_safe
+@api_login_required
+@versioned_condition(lambda request: [
+    ALL_FEEDS_VERSION, *follow_feed_version_keys(request.user)])
+def follow_index(request):
+    sources = [source.values(*POST_FIELDS, 'feed_date', 'feed_id')
+               for source in timeline.feed_sources(request.user)]
+    page = get_page(request, sources if len(sources) > 1 else sources[0],
+                    ordering=timeline.FEED_ORDERING)
+    return page_response(request, page, serialize_post)
+
+
+@require_safe
+@versioned_condition(lambda request, post_id: [
+    ALL_FEEDS_VERSION, POST_VERSION.format(post_id)], per_user=False)
+def post_detail(request, post_id):
+    post = Post.objects.filter(id=post_id).values(*POST_FIELDS).first()
+    if post is None:
+        return not_found()
+    comments = Comment.objects.filter(post_id=post_id).values(
+        *COMMENT_FIELDS)
+    page = CursorPaginator(comments, COMMENTS_PER_PAGE,
+                           COMMENTS_ORDERING).get_page(
+        cursor=request.GET.get('cursor'))
+    return page_response(request, page, serialize_comment,
+                         post=serialize_post(request, post))
@@ -0,0 +1,79 @@
+import json
+
+from django.contrib import admin
+from django.db.models import Avg, Count, Max, Q
+
+from . import jobs
+from .models import Job, QueryProfile, QueuedEmail
+
+
+@admin.register(QueryProfile)
+class QueryProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created',
+        'view_name',
+        'path',
+        'status_code',
+        'query_count',
+        'db_time',
+        'total_time',
+        'n_plus_one',
+    )
+    list_filter = ('n_plus_one', 'view_name', 'created')
+    search_fields = ('path',)
+    readonly_fields = ('duplicates_report',)
+    exclude = ('duplicates',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def duplicates_report(self, obj):
+        return '\n'.join(f'{item["count"]} × {item["sql"]}'
+                         for item in json.loads(obj.duplicates or '[]'))
+    duplicates_report.short_description = 'Повторяющиеся запросы'
+
+    def changelist_view(self, request, extra_context=None):
+        # Сводка по представлениям над списком профилей.
+        summary = (QueryProfile.objects.values('view_name')
+                   .annotate(requests=Count('id'),
+                             avg_queries=Avg('query_count'),
+                             max_queries=Max('query_count'),
+                             avg_db_time=Avg('db_time'),
+                             n_plus_one=Count('id', filter=Q(n_plus_one=True)))
+                   .order_by('-avg_queries'))
+        extra_context = {**(extra_context or {}), 'summary': summary}
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'func',
+        'priority',
+        'status',
+        'attempts',
+        'run_at',
+        'worker',
+    )
+    list_filter = ('status', 'func')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        jobs.retry_failed(queryset)
+    retry.short_description = 'Перезапустить упавшие и зависшие задачи'
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'subject',
+        'recipients',
+        'status',
+        'attempts',
+        'next_try',
+        'created',
+    )
+    list_filter = ('status',)
+    search_fields = ('recipients', 'subject')
+    exclude = ('message',)
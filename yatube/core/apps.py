@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth, db, sessions  # noqa: F401
+
+        connection_created.connect(db.configure_sqlite)
+        request_started.connect(db.check_connections)
+        request_started.connect(sessions.start_request)
+        request_finished.connect(sessions.finish_request)
@@ -0,0 +1,44 @@
+"""Бэкенд аутентификации с пользователем из кеша.
+
+``AuthenticationMiddleware`` на каждом запросе загружает пользователя
+из сессии. ``CachedModelBackend`` берёт его из кеша и сбрасывает запись
+при сохранении или удалении пользователя, в том числе при смене пароля.
+Изменения через ``QuerySet.update()`` сигналов не вызывают: их подхватит
+истечение ``USER_CACHE_TIMEOUT``. Пользователь хранится в кеше
+``USER_CACHE_ALIAS``, общем для всех воркеров.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+USER_CACHE_KEY = 'auth:user:{}'
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def user_cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_CACHE_KEY.format(user_id)
+        cache = user_cache()
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    user_cache().delete(USER_CACHE_KEY.format(instance.pk))
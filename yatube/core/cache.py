@@ -0,0 +1,70 @@
+"""Версионные ключи кеша и счётчики попаданий.
+
+Закешированные данные никогда не удаляются явно: в ключ входят
+версии объектов, от которых они зависят. Изменение объекта меняет
+его версию, и старые записи просто перестают читаться.
+"""
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+STATS_KEY = 'stats:{name}:{kind}'
+
+
+def new_version():
+    """Версия — время в микросекундах: она же служит отметкой изменения."""
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    """Текущие версии ключей; отсутствующие заводятся заново."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def _set_versions(keys):
+    version = new_version()
+    cache.set_many({key: version for key in keys}, None)
+
+
+def bump_versions(keys):
+    """Меняет версии сразу и ещё раз после коммита транзакции.
+
+    До коммита читатель может закешировать под новой версией старые
+    данные; повторная смена версии делает такие записи недоступными.
+    """
+    _set_versions(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_set_versions, keys))
+
+
+def record(name, hit, count=1):
+    """Добавляет ``count`` попаданий или промахов одним обращением."""
+    if not count:
+        return
+    key = STATS_KEY.format(name=name, kind='hits' if hit else 'misses')
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        if not cache.add(key, count, None):
+            cache.incr(key, count)
+
+
+def get_stats(name):
+    hits_key = STATS_KEY.format(name=name, kind='hits')
+    misses_key = STATS_KEY.format(name=name, kind='misses')
+    values = cache.get_many([hits_key, misses_key])
+    return values.get(hits_key, 0), values.get(misses_key, 0)
+
+
+def reset_stats(name):
+    cache.delete_many([STATS_KEY.format(name=name, kind=kind)
+                       for kind in ('hits', 'misses')])
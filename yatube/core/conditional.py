@@ -0,0 +1,80 @@
+"""Условный GET по версиям кеша.
+
+Версия в ``core.cache`` — время последнего изменения в микросекундах,
+поэтому по версиям, от которых зависит ответ, сразу получаются
+``ETag`` и ``Last-Modified``. Повторный запрос с совпавшим
+валидатором получает 304, не выполнив представление.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import get_versions
+
+
+def _versions(get_version_keys, request, *args, **kwargs):
+    """Версии ответа; считаются один раз на запрос."""
+    if not hasattr(request, '_condition_versions'):
+        keys = get_version_keys(request, *args, **kwargs)
+        request._condition_versions = (
+            None if keys is None else get_versions(keys))
+    return request._condition_versions
+
+
+def versions_etag(path, user, versions, csrf_token=''):
+    raw = f'{path}:{user}:{versions}'
+    if csrf_token:
+        raw = f'{raw}:{csrf_token}'
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def versions_last_modified(versions):
+    return datetime.fromtimestamp(max(versions) / 10 ** 6, timezone.utc)
+
+
+def _has_form(request, csrf):
+    return csrf and request.user.is_authenticated
+
+
+def versioned_condition(get_version_keys, per_user=True, csrf=False):
+    """Как ``condition()``, но валидаторы считаются по версиям кеша.
+
+    ``get_version_keys(request, *args, **kwargs)`` возвращает ключи
+    версий ответа или None, если валидаторов нет. ETag включает адрес
+    запроса и, при ``per_user``, пользователя: ответ зависит от зрителя.
+
+    ``csrf`` — страница показывает вошедшему пользователю форму
+    с CSRF-токеном. Токен меняется при входе, поэтому для таких
+    зрителей он входит в ETag, а ``Last-Modified`` не отдаётся: по дате
+    браузер получил бы 304 со старым токеном.
+    """
+    def etag(request, *args, **kwargs):
+        versions = _versions(get_version_keys, request, *args, **kwargs)
+        if versions is None:
+            return None
+        user = (request.user.pk or 0) if per_user else ''
+        csrf_token = (request.META.get('CSRF_COOKIE', '')
+                      if _has_form(request, csrf) else '')
+        return versions_etag(request.get_full_path(), user, versions,
+                             csrf_token)
+
+    def last_modified(request, *args, **kwargs):
+        versions = _versions(get_version_keys, request, *args, **kwargs)
+        if versions is None or _has_form(request, csrf):
+            return None
+        return versions_last_modified(versions)
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if per_user:
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,30 @@
+"""Настройка соединений с базой.
+
+``configure_sqlite`` выполняет ``SQLITE_PRAGMAS`` на каждом новом
+соединении с SQLite. Журнал WAL позволяет читать во время записи,
+а ``busy_timeout`` заставляет писателя ждать блокировку, а не падать
+с «database is locked».
+
+С ``CONN_MAX_AGE`` соединение переживает запрос, и сервер базы мог
+его уже закрыть. Для баз с ``CONN_HEALTH_CHECKS`` перед запросом
+соединение проверяется и при обрыве закрывается: следующий запрос
+к базе откроет новое. В Django 4.1+ это делает сам Django.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        if (connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and connection.connection is not None
+                and not connection.is_usable()):
+            connection.close()
@@ -0,0 +1,171 @@
+"""Очередь фоновых задач в основной базе, без внешнего брокера.
+
+``enqueue('module.func', args=[...])`` сохраняет вызов в таблицу
+``Job``; ``manage.py run_workers --processes N`` выполняет задачи
+в отдельных процессах. Задачи берутся по убыванию приоритета, затем
+по ``run_at``. Воркер забирает задачу через ``SELECT ... FOR UPDATE
+SKIP LOCKED``, а на SQLite, где блокировок строк нет, — условным
+``UPDATE ... WHERE status = 'queued'``: его выполнит ровно один воркер.
+
+Упавшая задача повторяется через ``JOB_RETRY_DELAY * 2 ** (n - 1)``
+секунд, после ``max_attempts`` попыток остаётся со статусом FAILED.
+Выполненные задачи удаляются. Задачи зависших воркеров (дольше
+``JOB_TIMEOUT``) возвращаются в очередь, поэтому функции задач
+должны быть идемпотентными; если попытки кончились — получают статус
+FAILED. Каждый воркер проверяет зависшие задачи раз
+в ``REQUEUE_INTERVAL`` секунд, даже когда очередь не пустеет.
+Опоздавший воркер не трогает задачу, которую уже забрал другой.
+``retry_failed()`` (действие в админке) даёт упавшим и зависшим задачам
+новые попытки; выполняющиеся задачи оно не трогает.
+"""
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Столько кандидатов перебирает воркер на SQLite, если задачу
+# перехватил другой.
+CLAIM_CANDIDATES = 10
+MAX_RETRY_DELAY = 60 * 60
+REQUEUE_INTERVAL = 60
+
+
+def get_retry_delay():
+    return getattr(settings, 'JOB_RETRY_DELAY', 10)
+
+
+def get_timeout():
+    return getattr(settings, 'JOB_TIMEOUT', 10 * 60)
+
+
+def enqueue(func, args=(), kwargs=None, priority=0, delay=None,
+            max_attempts=5):
+    """Ставит вызов ``func`` в очередь; ``delay`` — отложить на timedelta.
+
+    ``func`` — путь импорта функции или сама функция уровня модуля.
+    """
+    if callable(func):
+        func = f'{func.__module__}.{func.__qualname__}'
+    return Job.objects.create(
+        func=func, args=json.dumps(list(args), ensure_ascii=False),
+        kwargs=json.dumps(kwargs or {}, ensure_ascii=False),
+        priority=priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts)
+
+
+def worker_name(number=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def claim(worker):
+    """Забирает следующую задачу для ``worker`` или возвращает None."""
+    now = timezone.now()
+    queued = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by(
+        '-priority', 'run_at', 'id')
+    changes = {'status': Job.RUNNING, 'worker': worker, 'started': now,
+               'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = queued.select_for_update(skip_locked=True).values_list(
+                'id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(id=job_id).update(**changes)
+        return Job.objects.get(id=job_id)
+    for job_id in queued.values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+        # Условие на статус: из нескольких воркеров строку обновит один.
+        if Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+                **changes):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run(job):
+    """Выполняет забранную задачу. Возвращает True при успехе."""
+    # Задачу, которую после таймаута вернули в очередь или забрал
+    # другой воркер, этот воркер уже не меняет и не удаляет.
+    own = Job.objects.filter(id=job.id, status=Job.RUNNING,
+                             worker=job.worker, started=job.started)
+    try:
+        import_string(job.func)(*json.loads(job.args),
+                                **json.loads(job.kwargs))
+    except Exception:
+        logger.exception('Задача %s упала', job)
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = min(MAX_RETRY_DELAY,
+                        get_retry_delay() * 2 ** (job.attempts - 1))
+            own.update(status=Job.QUEUED, error=error,
+                       run_at=timezone.now() + timedelta(seconds=delay))
+        else:
+            own.update(status=Job.FAILED, error=error)
+        return False
+    own.delete()
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, не закончивших за
+    ``JOB_TIMEOUT``, или помечает FAILED, если попыток не осталось.
+    Возвращает число таких задач."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started__lt=now - timedelta(seconds=get_timeout()))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error=f'Воркер не завершил задачу за {get_timeout()} с.')
+    return failed + stale.update(status=Job.QUEUED, run_at=now)
+
+
+def retry_failed(queryset=None):
+    """Возвращает в очередь задачи FAILED и зависшие дольше
+    ``JOB_TIMEOUT`` с новыми попытками; возвращает их число.
+
+    Сброс ``worker`` и ``started`` не даёт прежнему воркеру изменить
+    или удалить задачу, если он всё-таки закончит.
+    """
+    if queryset is None:
+        queryset = Job.objects.all()
+    now = timezone.now()
+    return queryset.filter(
+        Q(status=Job.FAILED)
+        | Q(status=Job.RUNNING,
+            started__lt=now - timedelta(seconds=get_timeout()))).update(
+        status=Job.QUEUED, run_at=now, attempts=0, error='', worker='',
+        started=None)
+
+
+def work(worker, burst=False, interval=1.0, should_stop=lambda: False):
+    """Цикл воркера. Возвращает число выполненных задач.
+
+    ``burst`` — выйти, когда готовых задач не останется.
+    """
+    done = 0
+    next_requeue = 0
+    while not should_stop():
+        if time.monotonic() >= next_requeue:
+            requeue_stale()
+            next_requeue = time.monotonic() + REQUEUE_INTERVAL
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(interval)
+            continue
+        done += run(job)
+    return done
@@ -0,0 +1,79 @@
+"""Отправка почты через очередь в базе.
+
+``QueuedEmailBackend`` только сохраняет письма в таблицу
+``QueuedEmail`` — запрос не ждёт ни SMTP, ни записи файла.
+``manage.py send_queued_mail`` забирает письма пачками и отправляет
+каждую пачку через одно соединение настоящего бэкенда
+(``QUEUED_EMAIL_BACKEND``); у filebased-бэкенда это один файл на пачку.
+Неудачное письмо повторяется с растущей паузой, после
+``QUEUED_EMAIL_MAX_ATTEMPTS`` попыток остаётся со статусом FAILED.
+Отправитель должен работать в одном экземпляре.
+"""
+import logging
+import pickle
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 60 * 60
+
+
+def get_max_attempts():
+    return getattr(settings, 'QUEUED_EMAIL_MAX_ATTEMPTS', 5)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Ставит письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages):
+        emails = []
+        for message in email_messages:
+            # Соединение не сериализуется и при отправке будет своё.
+            message.connection = None
+            emails.append(QueuedEmail(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients())[:255],
+                message=pickle.dumps(message)))
+        QueuedEmail.objects.bulk_create(emails)
+        return len(emails)
+
+
+def send_batch(batch_size=BATCH_SIZE):
+    """Отправляет пачку писем; возвращает ``(отправлено, с ошибкой)``."""
+    emails = list(QueuedEmail.objects.filter(
+        status=QueuedEmail.QUEUED, next_try__lte=timezone.now()).order_by(
+            'id')[:batch_size])
+    if not emails:
+        return 0, 0
+    sent, failed = [], []
+    # Ошибка соединения не тратит попытки писем: пачка уйдёт позже.
+    with get_connection(settings.QUEUED_EMAIL_BACKEND) as connection:
+        for email in emails:
+            try:
+                connection.send_messages([pickle.loads(email.message)])
+            except Exception as error:
+                logger.exception('Письмо %s не отправлено', email.id)
+                failed.append((email, error))
+            else:
+                sent.append(email.id)
+    QueuedEmail.objects.filter(id__in=sent).delete()
+    for email, error in failed:
+        email.attempts += 1
+        email.error = repr(error)
+        if email.attempts >= get_max_attempts():
+            email.status = QueuedEmail.FAILED
+        else:
+            email.next_try = timezone.now() + timedelta(seconds=min(
+                MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (email.attempts - 1)))
+        email.save(update_fields=('attempts', 'error', 'status',
+                                  'next_try'))
+    return len(sent), len(failed)
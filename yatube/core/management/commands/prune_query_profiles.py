@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = ('Удаляет старые профили запросов. По умолчанию срок — '
+            'QUERY_PROFILING_RETENTION_DAYS дней.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Удалить профили старше стольких дней.')
+
+    def handle(self, *args, **options):
+        deleted = profiling.prune(options['days'])
+        self.stdout.write(f'Удалено профилей: {deleted}.')
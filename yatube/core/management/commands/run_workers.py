@@ -0,0 +1,55 @@
+import multiprocessing
+import signal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def run_process(number, burst, interval, stop):
+    """Воркер в отдельном процессе; завершается по событию ``stop``."""
+    # Ctrl+C обрабатывает родитель: воркер доделывает текущую задачу.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+    # Модели импортируются только после настройки Django в процессе.
+    from core import jobs
+    jobs.work(jobs.worker_name(number), burst=burst, interval=interval,
+              should_stop=stop.is_set)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи core.jobs в нескольких процессах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Пауза в секундах, когда задач нет.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выполнить готовые задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        from core import jobs
+
+        if options['processes'] == 1:
+            done = jobs.work(jobs.worker_name(), burst=options['burst'],
+                             interval=options['interval'])
+            self.stdout.write(f'Выполнено задач: {done}.')
+            return
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        # Процессы открывают свои соединения с базой.
+        connections.close_all()
+        processes = [
+            context.Process(target=run_process, args=(
+                number, options['burst'], options['interval'], stop))
+            for number in range(options['processes'])]
+        for process in processes:
+            process.start()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for process in processes:
+                process.join()
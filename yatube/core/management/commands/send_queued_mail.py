@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import mail
+from core.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = ('Отправляет письма из очереди пачками через одно соединение. '
+            'Запускайте в одном экземпляре.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=mail.BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Пауза в секундах, когда писем нет.')
+        parser.add_argument('--once', action='store_true',
+                            help='Отправить накопленное и завершиться.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            try:
+                sent, failed = mail.send_batch(options['batch_size'])
+            except Exception as error:
+                # Почтовый сервер недоступен: письма ждут в очереди.
+                self.stderr.write(f'Ошибка соединения: {error!r}')
+                sent = failed = 0
+                if options['once']:
+                    break
+            if sent or failed:
+                elapsed = time.perf_counter() - batch_started
+                total_sent += sent
+                total_failed += failed
+                self.stdout.write(
+                    f'Пачка: {sent} писем за {elapsed:.2f} с '
+                    f'({sent / max(elapsed, 1e-9):.0f} писем/с), '
+                    f'ошибок: {failed}.')
+            if sent:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        elapsed = time.perf_counter() - started
+        queued = QueuedEmail.objects.filter(
+            status=QueuedEmail.QUEUED).count()
+        self.stdout.write(
+            f'Отправлено писем: {total_sent} '
+            f'({total_sent / max(elapsed, 1e-9):.0f} писем/с), ошибок: '
+            f'{total_failed}, в очереди: {queued}.')
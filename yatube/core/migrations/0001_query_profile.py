@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('view_name', models.CharField(db_index=True, max_length=200, verbose_name='Представление')),
+                ('path', models.CharField(max_length=500, verbose_name='Адрес')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Запросов')),
+                ('db_time', models.FloatField(verbose_name='Время в базе, мс')),
+                ('total_time', models.FloatField(verbose_name='Время ответа, мс')),
+                ('n_plus_one', models.BooleanField(default=False, verbose_name='N+1')),
+                ('duplicates', models.TextField(blank=True, help_text='JSON: форма запроса и число повторов', verbose_name='Повторяющиеся запросы')),
+            ],
+            options={
+                'verbose_name': 'Профиль запросов',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
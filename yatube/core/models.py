@@ -1,4 +1,7 @@
+from contextlib import contextmanager
+
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -12,3 +15,114 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Позволяет сохранить ``pub_date``, заданную вручную.
+
+    На время блока у моделей отключается ``auto_now_add``. Меняет
+    поле для всего процесса, поэтому годится только для команд
+    массовой загрузки.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class QueryProfile(models.Model):
+    """Запросы к базе одного профилированного HTTP-запроса."""
+    created = models.DateTimeField('Дата', auto_now_add=True, db_index=True)
+    view_name = models.CharField('Представление', max_length=200,
+                                 db_index=True)
+    path = models.CharField('Адрес', max_length=500)
+    method = models.CharField('Метод', max_length=10)
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    query_count = models.PositiveIntegerField('Запросов')
+    db_time = models.FloatField('Время в базе, мс')
+    total_time = models.FloatField('Время ответа, мс')
+    n_plus_one = models.BooleanField('N+1', default=False)
+    duplicates = models.TextField(
+        'Повторяющиеся запросы', blank=True,
+        help_text='JSON: форма запроса и число повторов')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запросов'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.view_name}: {self.query_count}'
+
+
+class Job(models.Model):
+    """Фоновая задача ``core.jobs``: вызов функции по пути импорта."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    func = models.CharField('Функция', max_length=255)
+    args = models.TextField('Аргументы', default='[]',
+                            help_text='JSON-список')
+    kwargs = models.TextField('Именованные аргументы', default='{}',
+                              help_text='JSON-объект')
+    priority = models.SmallIntegerField(
+        'Приоритет', default=0, help_text='Большие выполняются раньше')
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField('Не раньше', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Попыток всего',
+                                                    default=5)
+    worker = models.CharField('Воркер', max_length=64, blank=True)
+    started = models.DateTimeField('Запущена', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [models.Index(fields=['status', '-priority', 'run_at'],
+                                name='job_claim')]
+
+    def __str__(self):
+        return f'{self.func} #{self.pk}'
+
+
+class QueuedEmail(models.Model):
+    """Письмо в очереди ``core.mail.QueuedEmailBackend``."""
+    QUEUED = 'queued'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.CharField('Тема', max_length=255)
+    recipients = models.CharField('Получатели', max_length=255)
+    message = models.BinaryField('Письмо')
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_try = models.DateTimeField('Не раньше', default=timezone.now)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Письма в очереди'
+        indexes = [models.Index(fields=['status', 'next_try'],
+                                name='queued_email_next_try')]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
@@ -0,0 +1,234 @@
+import base64
+import binascii
+import json
+import math
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Номер страницы из адреса ограничен: OFFSET должен поместиться
+# в целое SQLite, а такие номера всё равно за концом ленты.
+MAX_PAGE = 10 ** 9
+# Пределы целого в SQLite; числа за ними запрос не принимает.
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def get_value(obj, field):
+    """Значение поля объекта модели или словаря из ``values()``."""
+    if isinstance(obj, dict):
+        return obj['id' if field == 'pk' else field]
+    return getattr(obj, field)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по упорядоченному набору полей.
+
+    Следующая страница выбирается условием ``(pub_date, id) < (d, i)``,
+    поэтому время ответа не зависит от глубины страницы и не нужен
+    ``COUNT(*)``. Все поля сортировки должны иметь одно направление.
+
+    Возвращает обычный ``Page``: количество страниц пагинатор знает
+    только относительно текущей (есть ли следующая), а ссылки
+    на соседние страницы лежат в ``page.next_cursor``
+    и ``page.previous_cursor``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.descending = self.ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self._number = 1
+        self._has_next = False
+        self._length = 0
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    @property
+    def count(self):
+        """Нижняя оценка числа объектов — без запроса к базе."""
+        return (self._number - 1) * self.per_page + self._length + (
+            1 if self._has_next else 0)
+
+    def encode_cursor(self, obj, direction, number):
+        values = [direction, number]
+        for field in self.fields:
+            value = get_value(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, номер, значения) или None.
+
+        Курсор приходит от клиента, поэтому значения приводятся к типам
+        полей сортировки; чужое значение делает курсор недействительным.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, number, *values = json.loads(raw.decode())
+            number = int(number)
+        except (ValueError, TypeError, binascii.Error):
+            return None
+        if direction not in (NEXT, PREVIOUS) or (
+                len(values) != len(self.fields)):
+            return None
+        try:
+            values = [self._parse_value(field, value)
+                      for field, value in zip(self.fields, values)]
+        except (ValidationError, TypeError):
+            return None
+        return direction, min(number, MAX_PAGE), values
+
+    def _parse_value(self, name, value):
+        """Значение из курсора как значение поля ``name``."""
+        if value is None or isinstance(value, (list, dict)):
+            raise ValidationError('Неверное значение курсора.')
+        value = self._get_field(name).to_python(value)
+        if value is None or isinstance(value, int) and not (
+                MIN_INTEGER <= value <= MAX_INTEGER):
+            raise ValidationError('Неверное значение курсора.')
+        return value
+
+    def _get_field(self, name):
+        """Поле модели или выходное поле аннотации ``name``."""
+        try:
+            return self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.object_list.query.annotations[name].output_field
+
+    def _keyset_filter(self, values, after):
+        """Условие «строго после/до» ключа в порядке сортировки."""
+        lookup = 'lt' if self.descending == after else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:index], values[:index]))
+            condition |= Q(**equal, **{f'{field}__{lookup}': values[index]})
+        # Избыточное условие на первое поле даёт планировщику диапазон
+        # по индексу: без него OR превращается в сканирование.
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}'
+                     for field in self.ordering)
+
+    def _fetch(self, condition=None, reverse=False, offset=0):
+        """До ``per_page + 1`` объектов после ``offset`` в порядке ленты."""
+        queryset = self.object_list
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        if reverse:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        return list(queryset[offset:offset + self.per_page + 1])
+
+    def _build_page(self, objects, number, has_next):
+        self._number = number
+        self._has_next = has_next
+        self._length = len(objects)
+        page = self._get_page(objects, number, self)
+        page.next_cursor = self.encode_cursor(
+            objects[-1], NEXT, number + 1) if has_next else None
+        page.previous_cursor = self.encode_cursor(
+            objects[0], PREVIOUS, number - 1) if number > 1 else None
+        return page
+
+    def first_page(self):
+        objects = self._fetch()
+        return self._build_page(objects[:self.per_page], 1,
+                                has_next=len(objects) > self.per_page)
+
+    def page_from_cursor(self, cursor):
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            return self.first_page()
+        direction, number, values = decoded
+        if direction == NEXT:
+            objects = self._fetch(self._keyset_filter(values, after=True))
+            return self._build_page(objects[:self.per_page], max(number, 2),
+                                    has_next=len(objects) > self.per_page)
+        objects = self._fetch(self._keyset_filter(values, after=False),
+                              reverse=True)
+        if len(objects) <= self.per_page:
+            # Дошли до начала ленты: отдаём полноценную первую страницу.
+            return self.first_page()
+        return self._build_page(objects[:self.per_page][::-1],
+                                max(number, 2), has_next=True)
+
+    def page(self, number):
+        """Совместимость со старыми ссылками ``?page=N`` (через OFFSET).
+
+        Как ``Paginator.get_page``: номер за концом ленты даёт последнюю
+        страницу.
+        """
+        number = self.validate_number(number)
+        objects = self._fetch(offset=(number - 1) * self.per_page)
+        if not objects and number > 1:
+            # Номер последней страницы узнаём подсчётом: так бывает
+            # только на устаревших ссылках.
+            number = max(math.ceil(self._total() / self.per_page), 1)
+            objects = self._fetch(offset=(number - 1) * self.per_page)
+        if not objects:
+            return self.first_page()
+        return self._build_page(objects[:self.per_page], number,
+                                has_next=len(objects) > self.per_page)
+
+    def _total(self):
+        return self.object_list.count()
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return min(max(number, 1), MAX_PAGE)
+
+    def get_page(self, cursor=None, number=None):
+        if cursor:
+            return self.page_from_cursor(cursor)
+        if number:
+            return self.page(number)
+        return self.first_page()
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по слиянию нескольких выборок.
+
+    Каждая выборка читается своим диапазоном по индексу, страница
+    собирается слиянием результатов. Выборки должны отдавать объекты
+    с одинаковыми полями сортировки; дубликаты по ``pk`` отбрасываются.
+    """
+
+    def __init__(self, object_lists, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_lists[0], per_page, ordering)
+        self.sources = [queryset.order_by(*self.ordering)
+                        for queryset in object_lists]
+
+    def _total(self):
+        pks = set()
+        for queryset in self.sources:
+            pks.update(queryset.values_list('pk', flat=True))
+        return len(pks)
+
+    def _fetch(self, condition=None, reverse=False, offset=0):
+        limit = offset + self.per_page + 1
+        objects = {}
+        for queryset in self.sources:
+            if condition is not None:
+                queryset = queryset.filter(condition)
+            if reverse:
+                queryset = queryset.order_by(*self._reversed_ordering())
+            for obj in queryset[:limit]:
+                objects.setdefault(get_value(obj, 'pk'), obj)
+        return sorted(
+            objects.values(),
+            key=lambda obj: tuple(get_value(obj, field)
+                                  for field in self.fields),
+            reverse=self.descending != reverse,
+        )[offset:limit]
@@ -0,0 +1,147 @@
+"""Профилирование запросов к базе на уровне HTTP-запроса.
+
+``QueryProfilingMiddleware`` профилирует долю ``QUERY_PROFILING_RATE``
+запросов: считает запросы к базе и время в ней, группирует запросы
+по форме (SQL без значений параметров) и помечает N+1 — форму,
+повторённую не меньше ``QUERY_PROFILING_N_PLUS_ONE`` раз. Итог пишется
+JSON-строкой в лог ``yatube.queries`` и в таблицу ``QueryProfile``.
+Профили старше ``QUERY_PROFILING_RETENTION_DAYS`` дней удаляются
+каждые ``PRUNE_EVERY`` сохранённых профилей процесса и командой
+``manage.py prune_query_profiles``.
+
+``plan_problems`` разбирает план SQLite (EXPLAIN QUERY PLAN) и находит
+полные просмотры таблиц и сортировки во временном B-дереве.
+"""
+import itertools
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .models import QueryProfile
+
+logger = logging.getLogger('yatube.queries')
+
+DUPLICATES_LIMIT = 10
+PRUNE_EVERY = 100
+
+_saved_profiles = itertools.count(1)
+
+_IN_LIST_RE = re.compile(r'\((?:%s|\?)(?:, (?:%s|\?))*\)')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+# «SCAN posts_post» без индекса; «SCAN t USING INDEX» и виртуальные
+# таблицы FTS5 полным просмотром не считаются.
+_FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+_TEMP_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?:\w+ PART OF )?ORDER BY$')
+
+
+def query_shape(sql):
+    """SQL без конкретных значений: запросы с разными id совпадают."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _IN_LIST_RE.sub('(...)', sql)
+
+
+class QueryCollector:
+    """Обёртка ``execute_wrapper``, запоминающая SQL и время запросов."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+
+def summarize(queries, threshold):
+    shapes = Counter(query_shape(sql) for sql, _ in queries)
+    duplicates = [{'sql': shape, 'count': count}
+                  for shape, count in shapes.most_common(DUPLICATES_LIMIT)
+                  if count > 1]
+    return {
+        'query_count': len(queries),
+        'db_time': round(sum(duration for _, duration in queries) * 1000, 2),
+        'n_plus_one': any(item['count'] >= threshold for item in duplicates),
+        'duplicates': duplicates,
+    }
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'QUERY_PROFILING_RATE', 0)
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        total_time = (time.perf_counter() - started) * 1000
+        self.report(request, response, collector.queries, total_time)
+        return response
+
+    def report(self, request, response, queries, total_time):
+        match = request.resolver_match
+        profile = {
+            'view_name': match.view_name if match else '',
+            'path': request.get_full_path()[:500],
+            'method': request.method,
+            'status_code': response.status_code,
+            'total_time': round(total_time, 2),
+            **summarize(queries, getattr(
+                settings, 'QUERY_PROFILING_N_PLUS_ONE', 5)),
+        }
+        level = logging.WARNING if profile['n_plus_one'] else logging.INFO
+        logger.log(level, json.dumps(profile, ensure_ascii=False))
+        try:
+            QueryProfile.objects.create(
+                **{**profile, 'duplicates': json.dumps(
+                    profile['duplicates'], ensure_ascii=False)})
+            if next(_saved_profiles) % PRUNE_EVERY == 0:
+                prune()
+        except DatabaseError:
+            logger.exception('Профиль запросов не сохранён')
+
+
+def prune(days=None):
+    """Удаляет профили старше ``days`` дней. Возвращает их число."""
+    if days is None:
+        days = getattr(settings, 'QUERY_PROFILING_RETENTION_DAYS', 7)
+    deleted, _ = QueryProfile.objects.filter(
+        created__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def explain(sql, db_connection=connection):
+    """Шаги плана SQLite для запроса с подставленными параметрами."""
+    with db_connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, allowed_tables=()):
+    """Полные просмотры таблиц и временные сортировки в плане."""
+    # Результаты полнотекстового поиска ранжируются по релевантности,
+    # и их сортировку индекс не заменит.
+    ranked = any('VIRTUAL TABLE' in step for step in plan)
+    problems = []
+    for step in plan:
+        match = _FULL_SCAN_RE.match(step)
+        if match and match.group(1) not in allowed_tables:
+            problems.append(step)
+        elif _TEMP_SORT_RE.match(step) and not ranked:
+            problems.append(step)
+    return problems
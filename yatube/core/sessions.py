@@ -0,0 +1,60 @@
+"""Сессии в общем кеше с отложенной записью в базу.
+
+Как ``cached_db``: сессия читается из кеша, база нужна лишь при
+промахе. Изменённая сессия сразу пишется в кеш, а в базу — после
+отправки ответа (сигнал ``request_finished``), так что запрос
+не ждёт записи. Вне запроса сессия сохраняется сразу.
+
+Отложенная запись включается ``SESSION_WRITE_BEHIND``: она безопасна
+только с общим кешем. С кешем в памяти процесса другой воркер
+не увидел бы сессию до записи в базу. Кеш сессий —
+``SESSION_CACHE_ALIAS``, в настройках это общий кеш без локального
+слоя.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+KEY_PREFIX = 'core.sessions'
+
+_request_sessions = threading.local()
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def save(self, must_create=False):
+        pending = getattr(_request_sessions, 'stores', None)
+        if pending is None or not getattr(settings, 'SESSION_WRITE_BEHIND',
+                                          False):
+            return super().save(must_create)
+        if self.session_key is None:
+            return self.create()
+        # Новый ключ уже проверен на уникальность в create() через exists().
+        self._cache.set(self.cache_key, self._get_session(
+            no_load=must_create), self.get_expiry_age())
+        # Новую сессию в базу нужно вставить, а не обновить.
+        created = pending.get(self.cache_key, (None, False))[1]
+        pending[self.cache_key] = (self, created or must_create)
+
+    def delete(self, session_key=None):
+        pending = getattr(_request_sessions, 'stores', None)
+        if pending is not None:
+            pending.pop(KEY_PREFIX + (session_key or self.session_key or ''),
+                        None)
+        super().delete(session_key)
+
+
+def start_request(**kwargs):
+    _request_sessions.stores = {}
+
+
+def finish_request(**kwargs):
+    """Записывает в базу сессии, изменённые за запрос."""
+    stores = getattr(_request_sessions, 'stores', None)
+    _request_sessions.stores = None
+    for store, must_create in (stores or {}).values():
+        if store.session_key is not None:
+            DBStore.save(store, must_create)
@@ -0,0 +1,40 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+TWO_LEVEL_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TwoLevelCache',
+        'OPTIONS': {'SHARED': 'shared', 'LOCAL_TIMEOUT': 60},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-level-tests',
+    },
+}
+
+
+@override_settings(CACHES=TWO_LEVEL_CACHES)
+class TwoLevelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def test_writes_go_to_shared_cache(self):
+        """Запись видна в общем кеше сразу."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+
+    def test_reads_are_served_locally(self):
+        """Повторное чтение не идёт в общий кеш до истечения LOCAL_TIMEOUT."""
+        self.shared.set('key', 'old')
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.shared.set('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.assertEqual(self.cache.get_many(['key']), {'key': 'old'})
+
+    def test_incr_bypasses_local_copy(self):
+        """incr выполняется в общем кеше и сбрасывает локальную копию."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
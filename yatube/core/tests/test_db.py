@@ -0,0 +1,20 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+
+
+class SqlitePragmasTest(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234,
+                                       'temp_store': 'memory'})
+    def test_pragmas_on_new_connection(self):
+        """SQLITE_PRAGMAS выполняются на каждом новом соединении."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('PRAGMA есть только у SQLite')
+        new_connection = connection.copy()
+        try:
+            with new_connection.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            new_connection.close()
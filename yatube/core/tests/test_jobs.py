@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+calls = []
+
+
+def remember(value):
+    calls.append(value)
+
+
+def fail():
+    raise ValueError('сбой')
+
+
+@override_settings(JOB_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self):
+        call_command('run_workers', processes=1, burst=True,
+                     stdout=StringIO())
+
+    def test_priority_and_schedule(self):
+        """Задачи идут по приоритету, отложенные ждут своего времени."""
+        jobs.enqueue(remember, args=['обычная'])
+        jobs.enqueue('core.tests.test_jobs.remember', args=['срочная'],
+                     priority=10)
+        jobs.enqueue(remember, args=['отложенная'],
+                     delay=timedelta(hours=1))
+        self.run_workers()
+        self.assertEqual(calls, ['срочная', 'обычная'])
+        self.assertEqual(list(Job.objects.values_list('args', flat=True)),
+                         ['["отложенная"]'])
+
+    def test_claimed_once(self):
+        """Забранную задачу другой воркер не получит."""
+        job = jobs.enqueue(remember, args=[1])
+        self.assertEqual(jobs.claim('first').id, job.id)
+        self.assertIsNone(jobs.claim('second'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts),
+                         (Job.RUNNING, 'first', 1))
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой, затем FAILED."""
+        job = jobs.enqueue(fail, max_attempts=2)
+        with self.assertLogs('core.jobs'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('ValueError', job.error)
+        self.assertGreater(job.run_at,
+                           timezone.now() + timedelta(seconds=9))
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_job_requeued(self):
+        """Задача зависшего воркера возвращается в очередь."""
+        jobs.enqueue(remember, args=[1])
+        jobs.claim('lost')
+        self.assertEqual(jobs.requeue_stale(), 0)
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.run_workers()
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_job_without_attempts_failed(self):
+        """Зависшая задача с последней попыткой получает FAILED."""
+        job = jobs.enqueue(remember, args=[1], max_attempts=1)
+        jobs.claim('lost')
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('60', job.error)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_jobs_requeued_while_busy(self):
+        """Зависшие задачи возвращаются в очередь, даже когда воркеру
+        есть что делать."""
+        jobs.enqueue(remember, args=[1])
+        jobs.claim('lost')
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        jobs.enqueue(remember, args=[2])
+        self.run_workers()
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_late_worker_keeps_requeued_job(self):
+        """Опоздавший воркер не удаляет задачу, забранную заново."""
+        jobs.enqueue(remember, args=[1])
+        slow = jobs.claim('slow')
+        Job.objects.update(started=timezone.now() - timedelta(minutes=2))
+        jobs.requeue_stale()
+        fresh = jobs.claim('fresh')
+        self.assertTrue(jobs.run(slow))
+        fresh.refresh_from_db()
+        self.assertEqual((fresh.status, fresh.worker),
+                         (Job.RUNNING, 'fresh'))
+        self.assertTrue(jobs.run(fresh))
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_retry_skips_running_jobs(self):
+        """Перезапуск даёт попытки упавшим и зависшим задачам,
+        а выполняющуюся не трогает."""
+        failed = jobs.enqueue(remember, args=[1])
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED,
+                                                attempts=5, error='сбой')
+        jobs.enqueue(remember, args=[2])
+        running = jobs.claim('busy')
+        jobs.enqueue(remember, args=[3])
+        stale = jobs.claim('lost')
+        Job.objects.filter(pk=stale.pk).update(
+            started=timezone.now() - timedelta(minutes=2))
+        stale.refresh_from_db()
+        self.assertEqual(jobs.retry_failed(), 2)
+        self.assertEqual(
+            dict(Job.objects.values_list('pk', 'status')),
+            {failed.pk: Job.QUEUED, running.pk: Job.RUNNING,
+             stale.pk: Job.QUEUED})
+        self.assertEqual(Job.objects.get(pk=failed.pk).attempts, 0)
+        # Зависший воркер, закончив позже, задачу уже не удалит.
+        self.assertTrue(jobs.run(stale))
+        self.assertTrue(Job.objects.filter(pk=stale.pk).exists())
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import QueuedEmail
+
+User = get_user_model()
+
+BROKEN_ADDRESS = 'broken@example.com'
+
+
+class CountingBackend(EmailBackend):
+    """locmem-бэкенд, который считает соединения и не принимает
+    письма на BROKEN_ADDRESS."""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any(BROKEN_ADDRESS in message.to for message in messages):
+            raise ConnectionError('отказ сервера')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+    QUEUED_EMAIL_BACKEND='core.tests.test_mail.CountingBackend',
+    QUEUED_EMAIL_MAX_ATTEMPTS=2)
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def send_queued_mail(self):
+        call_command('send_queued_mail', once=True, batch_size=10,
+                     stdout=StringIO())
+
+    def test_password_reset_queued(self):
+        """Письмо сброса пароля ставится в очередь и уходит отправителем."""
+        User.objects.create_user(username='reader',
+                                 email='reader@example.com',
+                                 password='password')
+        self.client.post(reverse('users:password_reset_form'),
+                         {'email': 'reader@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().recipients,
+                         'reader@example.com')
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_batches_and_retries(self):
+        """Пачка идёт через одно соединение, отказ повторяется."""
+        for number in range(25):
+            send_mail('Тема', 'Текст', 'from@example.com',
+                      [f'user{number}@example.com'])
+        send_mail('Тема', 'Текст', 'from@example.com', [BROKEN_ADDRESS])
+        with self.assertLogs('core.mail'):
+            self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(CountingBackend.opened, 3)
+        email = QueuedEmail.objects.get()
+        self.assertEqual((email.status, email.attempts),
+                         (QueuedEmail.QUEUED, 1))
+        self.assertIn('отказ сервера', email.error)
+        QueuedEmail.objects.update(next_try=timezone.now())
+        with self.assertLogs('core.mail'):
+            self.send_queued_mail()
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.FAILED)
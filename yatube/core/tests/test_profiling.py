@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import profiling
+from core.models import QueryProfile
+from core.profiling import plan_problems, query_shape, summarize
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryShapeTests(SimpleTestCase):
+    def test_values_do_not_change_shape(self):
+        """Запросы, отличающиеся только значениями, имеют одну форму."""
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            query_shape('SELECT * FROM t WHERE id IN (%s) LIMIT 5'))
+        self.assertNotEqual(query_shape('SELECT a FROM t'),
+                            query_shape('SELECT b FROM t'))
+
+    def test_n_plus_one_threshold(self):
+        """N+1 — форма, повторённая не меньше порога раз."""
+        queries = [(f'SELECT * FROM t WHERE id = {number}', 0.001)
+                   for number in range(5)]
+        self.assertTrue(summarize(queries, threshold=5)['n_plus_one'])
+        self.assertFalse(summarize(queries, threshold=6)['n_plus_one'])
+
+    def test_plan_problems(self):
+        """Полный просмотр и временная сортировка — проблемы плана."""
+        self.assertEqual(plan_problems([
+            'SCAN posts_post',
+            'SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)',
+            'SCAN posts_post USING INDEX posts_post_pub_date',
+            'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY',
+        ]), ['SCAN posts_post', 'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY'])
+        self.assertEqual(plan_problems(['SCAN posts_group'],
+                                       ('posts_group',)), [])
+        self.assertEqual(plan_problems([
+            'SCAN posts_search VIRTUAL TABLE INDEX 0:M2',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]), [])
+
+
+@override_settings(QUERY_PROFILING_RATE=1)
+class QueryProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        for number in range(6):
+            author = User.objects.create_user(username=f'author_{number}')
+            group = Group.objects.create(title=f'Группа {number}',
+                                         slug=f'group-{number}')
+            Post.objects.create(author=author, group=group, text='Текст')
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_profile_is_recorded(self):
+        """Профиль запроса пишется в лог и в базу."""
+        with self.assertLogs('yatube.queries', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('"view_name": "posts:index"', logs.output[0])
+        profile = QueryProfile.objects.get()
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.query_count, 0)
+
+    def make_old_profile(self, days):
+        profile = QueryProfile.objects.create(
+            view_name='posts:index', path='/', method='GET',
+            status_code=200, query_count=1, db_time=1, total_time=1)
+        QueryProfile.objects.filter(pk=profile.pk).update(
+            created=timezone.now() - timedelta(days=days))
+        return profile
+
+    @override_settings(QUERY_PROFILING_RETENTION_DAYS=7)
+    def test_old_profiles_pruned(self):
+        """Профили старше срока хранения удаляются по ходу записи."""
+        old = self.make_old_profile(days=8)
+        kept = self.make_old_profile(days=6)
+        with mock.patch.object(profiling, 'PRUNE_EVERY', 1), \
+                self.assertLogs('yatube.queries', 'INFO'):
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(QueryProfile.objects.filter(pk=old.pk).exists())
+        self.assertTrue(QueryProfile.objects.filter(pk=kept.pk).exists())
+        self.assertEqual(QueryProfile.objects.count(), 2)
+
+    def test_prune_command(self):
+        """prune_query_profiles удаляет профили старше --days."""
+        self.make_old_profile(days=3)
+        kept = self.make_old_profile(days=1)
+        out = StringIO()
+        call_command('prune_query_profiles', days=2, stdout=out)
+        self.assertIn('Удалено профилей: 1.', out.getvalue())
+        self.assertEqual(list(QueryProfile.objects.values_list(
+            'pk', flat=True)), [kept.pk])
+
+    def test_feeds_have_no_n_plus_one(self):
+        """Ленты не делают отдельных запросов на каждый пост."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group-0'}),
+            reverse('posts:profile', kwargs={'username': 'author_0'}),
+            reverse('posts:follow_index'),
+        )
+        with self.assertLogs('yatube.queries', 'INFO'):
+            for url in urls:
+                self.client.get(url)
+        self.assertEqual(QueryProfile.objects.count(), len(urls))
+        self.assertFalse(QueryProfile.objects.filter(n_plus_one=True).exists())
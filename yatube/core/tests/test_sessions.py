@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import sessions
+from core.auth import USER_CACHE_KEY
+
+User = get_user_model()
+
+
+class CachedSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader',
+                                             password='password')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_cached_page_without_queries(self):
+        """Вошедший пользователь получает закешированную ленту без
+        запросов к базе: сессия и пользователь берутся из кеша."""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_drops_cached_user(self):
+        """После смены пароля сессия со старым паролем недействительна."""
+        self.client.get(reverse('posts:index'))
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertRedirects(
+            response, reverse('users:login') + '?next='
+            + reverse('posts:follow_index'))
+
+    @override_settings(
+        CACHES={
+            'default': {
+                'BACKEND': 'core.cache_backends.TwoLevelCache',
+                'OPTIONS': {'SHARED': 'shared', 'LOCAL_TIMEOUT': 5},
+            },
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'sessions-shared',
+            },
+        },
+        SESSION_CACHE_ALIAS='shared', USER_CACHE_ALIAS='shared')
+    def test_sessions_bypass_local_cache(self):
+        """Сессия и пользователь лежат в общем кеше, а не в локальном
+        слое: выход сразу виден всем воркерам."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        session_key = sessions.KEY_PREFIX + client.session.session_key
+        user_key = USER_CACHE_KEY.format(self.user.pk)
+        self.assertIsNotNone(caches['shared'].get(session_key))
+        self.assertIsNotNone(caches['shared'].get(user_key))
+        local_keys = ' '.join(map(str, caches['default']._local))
+        self.assertNotIn(session_key, local_keys)
+        self.assertNotIn(user_key, local_keys)
+        caches['shared'].clear()
+
+    @override_settings(SESSION_WRITE_BEHIND=True)
+    def test_write_behind(self):
+        """В запросе сессия пишется в кеш, в базу — после ответа."""
+        Session.objects.all().delete()
+        sessions.start_request()
+        store = sessions.SessionStore()
+        store['answer'] = 42
+        store.save()
+        discarded = sessions.SessionStore()
+        discarded['answer'] = 0
+        discarded.save()
+        discarded.flush()
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(
+            sessions.SessionStore(store.session_key)['answer'], 42)
+        sessions.finish_request()
+        self.assertEqual(
+            Session.objects.get().get_decoded(), {'answer': 42})
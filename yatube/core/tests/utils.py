@@ -0,0 +1,25 @@
+from unittest import mock
+
+
+class RunOnCommitMixin:
+    """Выполняет колбэки ``transaction.on_commit`` сразу.
+
+    ``TestCase`` держит тест в транзакции, которая откатывается, и без
+    этого события outbox при ``OUTBOX_EAGER`` в тестах не доставлялись бы.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls._on_commit_patcher = mock.patch(
+            'django.db.transaction.on_commit',
+            lambda func, using=None: func())
+        cls._on_commit_patcher.start()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._on_commit_patcher.stop()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._on_commit_patcher.stop()
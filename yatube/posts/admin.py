@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import outbox
+from .models import (Comment, Follow, Group, OutboxEvent, Post, ThumbnailJob,
+                     UserStats)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -17,7 +19,49 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+    readonly_fields = ('posts_count', 'followers_count', 'following_count')
+
+
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'source',
+        'geometry',
+        'status',
+        'created',
+        'finished',
+    )
+    list_filter = ('status',)
+    search_fields = ('source',)
+
+
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'topic',
+        'status',
+        'attempts',
+        'next_try',
+        'created',
+    )
+    list_filter = ('status', 'topic')
+    actions = ('requeue',)
+
+    def requeue(self, request, queryset):
+        outbox.requeue_failed(queryset)
+    requeue.short_description = 'Вернуть в очередь события с ошибкой'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
+admin.site.register(UserStats, UserStatsAdmin)
+admin.site.register(ThumbnailJob, ThumbnailJobAdmin)
+admin.site.register(OutboxEvent, OutboxEventAdmin)
@@ -0,0 +1,225 @@
+"""Кеш лент и отрисованных карточек постов.
+
+Ключ карточки складывается из версий поста, его автора и группы,
+поэтому одна и та же карточка переиспользуется всеми лентами.
+Ленты кешируются страницами; сигналы меняют версии ровно тех лент,
+которые затронуло изменение.
+"""
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from core.cache import bump_versions, get_versions, record
+from core.conditional import versioned_condition
+
+from .models import Follow, Group
+
+CARD_TEMPLATE = 'posts/includes/for_post_in_posts.html'
+CARD_TIMEOUT = 60 * 60 * 24
+CARD_STATS = 'post_card'
+
+POST_VERSION = 'version:post:{}'
+USER_VERSION = 'version:user:{}'
+GROUP_VERSION = 'version:group:{}'
+
+FEED_TIMEOUT = 60 * 20
+FEED_STATS = 'feed'
+
+ALL_FEEDS_VERSION = 'version:feed:all'
+# Все карточки сразу: только после массовых правок без сигналов.
+ALL_CARDS_VERSION = 'version:card:all'
+INDEX_VERSION = 'version:feed:index'
+GROUP_FEED_VERSION = 'version:feed:group:{}'
+PROFILE_FEED_VERSION = 'version:feed:profile:{}'
+FOLLOW_FEED_VERSION = 'version:feed:follow:{}'
+# Посты авторов в лентах подписок. Авторы разложены по
+# AUTHOR_VERSION_BUCKETS корзинам с общей версией: ключ ленты подписок
+# зависит не больше чем от стольких версий, сколько бы ни было подписок.
+AUTHOR_FEED_VERSION = 'version:feed:authors:{}'
+AUTHOR_VERSION_BUCKETS = 64
+FOLLOW_BUCKETS_KEY = 'follow_buckets:{}:{}'
+
+
+def key_hash(value):
+    """Часть ключа фиксированной длины из одних шестнадцатеричных цифр.
+
+    Имена пользователей и адреса могут содержать символы, которые
+    memcached в ключах не принимает, а версии — быть сколь угодно длинными.
+    """
+    return hashlib.md5(str(value).encode()).hexdigest()
+
+
+def profile_feed_version(username):
+    return PROFILE_FEED_VERSION.format(key_hash(username))
+
+
+def author_feed_version(author_id):
+    return AUTHOR_FEED_VERSION.format(author_id % AUTHOR_VERSION_BUCKETS)
+
+
+def bump_post(post_id):
+    bump_versions([POST_VERSION.format(post_id)])
+
+
+def bump_user(user_id):
+    bump_versions([USER_VERSION.format(user_id)])
+
+
+def bump_group(group_id):
+    bump_versions([GROUP_VERSION.format(group_id)])
+
+
+def card_version_keys(post):
+    keys = [ALL_CARDS_VERSION, POST_VERSION.format(post.id),
+            USER_VERSION.format(post.author_id)]
+    if post.group_id:
+        keys.append(GROUP_VERSION.format(post.group_id))
+    return keys
+
+
+def card_key(post, show_group, versions=None):
+    """Ключ карточки; ``versions`` — уже прочитанные версии по ключам."""
+    version_keys = card_version_keys(post)
+    if versions is None:
+        versions = dict(zip(version_keys, get_versions(version_keys)))
+    joined = '.'.join(str(versions[key]) for key in version_keys)
+    return f'post_card:{post.id}:{int(show_group)}:{joined}'
+
+
+def render_cards(posts, show_group=True):
+    """Карточки страницы: ``{post.id: html}``.
+
+    Версии всех карточек и сами карточки читаются двумя ``get_many``,
+    недостающие пишутся одним ``set_many``.
+    """
+    version_keys = list(dict.fromkeys(
+        key for post in posts for key in card_version_keys(post)))
+    versions = dict(zip(version_keys, get_versions(version_keys)))
+    keys = {post.id: card_key(post, show_group, versions) for post in posts}
+    cached = cache.get_many(list(keys.values()))
+    cards = {}
+    missing = {}
+    for post in posts:
+        html = cached.get(keys[post.id])
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {'post': post,
+                                                    'show_group': show_group})
+            missing[keys[post.id]] = html
+        cards[post.id] = html
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    record(CARD_STATS, hit=True, count=len(keys) - len(missing))
+    record(CARD_STATS, hit=False, count=len(missing))
+    return cards
+
+
+def render_card(post, show_group=True):
+    return render_cards([post], show_group)[post.id]
+
+
+def cache_feed(get_version_keys):
+    """Кеширует ленту целиком до изменения влияющих на неё объектов.
+
+    ``get_version_keys(request, **kwargs)`` возвращает ключи версий
+    ленты; к ним добавляется общая версия всех лент. Ответ хранится
+    отдельно для каждого зрителя: шапка и кнопка подписки зависят от него.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version_keys = [ALL_FEEDS_VERSION,
+                            *get_version_keys(request, **kwargs)]
+            request.feed_version_keys = version_keys
+            versions = key_hash('.'.join(
+                str(version) for version in get_versions(version_keys)))
+            path = key_hash(request.get_full_path())
+            key = f'feed:{path}:{request.user.pk or 0}:{versions}'
+            content = cache.get(key)
+            record(FEED_STATS, hit=content is not None)
+            if content is not None:
+                return HttpResponse(content)
+            response = view(request, *args, **kwargs)
+            if response.status_code == HTTPStatus.OK:
+                cache.set(key, response.content, FEED_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def feed_condition(get_version_keys, per_user=True, csrf=False):
+    """Условный GET страницы по версиям, от которых она зависит.
+
+    ``get_version_keys(request, **kwargs)`` — как у ``cache_feed``
+    (или None, если объекта нет); 304 не выполняет представление.
+    ``csrf`` — как у ``versioned_condition``: на странице есть форма.
+    """
+    def all_version_keys(request, *args, **kwargs):
+        keys = get_version_keys(request, *args, **kwargs)
+        return None if keys is None else [ALL_FEEDS_VERSION, *keys]
+    return versioned_condition(all_version_keys, per_user, csrf)
+
+
+def follow_feed_version_keys(user):
+    """Ключи версий ленты подписок: её собственная и корзин авторов.
+
+    Корзины подписок кешируются до смены версии ленты, которая меняется
+    при подписке и отписке, поэтому таблица подписок не читается.
+    """
+    follow_key = FOLLOW_FEED_VERSION.format(user.pk)
+    version, = get_versions([follow_key])
+    buckets_key = FOLLOW_BUCKETS_KEY.format(user.pk, version)
+    buckets = cache.get(buckets_key)
+    if buckets is None:
+        buckets = sorted({
+            author_id % AUTHOR_VERSION_BUCKETS
+            for author_id in Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True)})
+        cache.set(buckets_key, buckets, FEED_TIMEOUT)
+    return [follow_key,
+            *(AUTHOR_FEED_VERSION.format(bucket) for bucket in buckets)]
+
+
+def invalidate_follower_feeds(author_id):
+    """Сбрасывает ленты подписок всех подписчиков автора."""
+    bump_versions([author_feed_version(author_id)])
+
+
+def invalidate_post_feeds(post, group_ids=(), followers=True):
+    """Сбрасывает ленты, в которых показывается пост.
+
+    ``group_ids`` — группы поста до изменения: пост мог из них уйти.
+    Без ``followers`` ленты подписчиков не трогаются: новый пост
+    попадёт в них позже, при раскладке.
+    """
+    group_ids = {post.group_id, *group_ids} - {None}
+    keys = [INDEX_VERSION, profile_feed_version(post.author.username)]
+    slugs = Group.objects.filter(
+        id__in=group_ids).values_list('slug', flat=True)
+    keys.extend(GROUP_FEED_VERSION.format(slug) for slug in slugs)
+    if followers:
+        keys.append(author_feed_version(post.author_id))
+    bump_versions(keys)
+
+
+def invalidate_follow_feeds(follow):
+    # Счётчики подписок показываются в профилях обоих пользователей.
+    bump_versions([FOLLOW_FEED_VERSION.format(follow.user_id),
+                   profile_feed_version(follow.user.username),
+                   profile_feed_version(follow.author.username)])
+
+
+def invalidate_all_feeds(cards=False):
+    """Сбрасывает все ленты, а с ``cards`` — и все карточки.
+
+    Карточки сбрасываются только после массовых изменений без сигналов
+    (загрузка, пересчёт счётчиков): правки пользователей и групп
+    меняют версии своих карточек.
+    """
+    bump_versions([ALL_FEEDS_VERSION, ALL_CARDS_VERSION] if cards
+                  else [ALL_FEEDS_VERSION])
@@ -0,0 +1,51 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно меняет счётчики пользователя на ``deltas``."""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    # Строки ещё нет: заводим её только при увеличении. При каскадном
+    # удалении пользователя его статистика может быть уже удалена.
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def _count(queryset, field):
+    """Подзапрос с количеством строк ``queryset`` для ``OuterRef``."""
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')).values('total')), Value(0))
+
+
+def rebuild():
+    """Пересчитывает все счётчики несколькими массовыми UPDATE."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id)
+         for user_id in User.objects.filter(stats__isnull=True).values_list(
+             'id', flat=True)),
+        ignore_conflicts=True)
+    UserStats.objects.update(
+        posts_count=_count(
+            Post.objects.filter(author=OuterRef('user')), 'author'),
+        followers_count=_count(
+            Follow.objects.filter(author=OuterRef('user')), 'author'),
+        following_count=_count(
+            Follow.objects.filter(user=OuterRef('user')), 'user'),
+    )
+    Post.objects.update(comments_count=_count(
+        Comment.objects.filter(post=OuterRef('pk')), 'post'))
@@ -0,0 +1,56 @@
+"""Обработчики событий outbox: поиск и материализованные ленты.
+
+Счётчики и версии кеша меняются сразу в сигналах: это дёшево, и автор
+видит изменение на следующей странице. Здесь — то, что зависит от
+числа подписчиков или объёма текста.
+"""
+from core.cache import bump_versions
+
+from . import cache, search, timeline
+from .models import Post
+from .outbox import handler
+
+
+@handler('post.saved')
+def post_saved(post_id, created):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    search.index_post(post)
+    if created:
+        timeline.fan_out_post(post)
+        cache.invalidate_follower_feeds(post.author_id)
+
+
+@handler('post.deleted')
+def post_deleted(post_id):
+    search.unindex_post(post_id)
+
+
+@handler('comment.changed')
+def comment_changed(post_id, added=None, removed=None):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    if added is None and removed is None:
+        # Событие без текста комментария: переиндексируем пост целиком.
+        search.index_post(post)
+    else:
+        search.index_comment(post, added or '', removed or '')
+
+
+@handler('follow.created')
+def follow_created(user_id, author_id):
+    timeline.add_author(user_id, author_id)
+    bump_versions([cache.FOLLOW_FEED_VERSION.format(user_id)])
+
+
+@handler('follow.deleted')
+def follow_deleted(user_id, author_id, backfill=False):
+    timeline.remove_author(user_id, author_id)
+    bump_versions([cache.FOLLOW_FEED_VERSION.format(user_id)])
+    if backfill:
+        # Автор опустился ниже порога раскладки: его посты больше
+        # не читаются при запросе и должны лежать в лентах.
+        timeline.backfill_author(author_id)
+        cache.invalidate_follower_feeds(author_id)
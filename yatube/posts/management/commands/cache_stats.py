@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats, reset_stats
+from posts.cache import CARD_STATS, FEED_STATS
+from posts.middleware import ANONYMOUS_FEED_STATS
+
+STATS = (ANONYMOUS_FEED_STATS, FEED_STATS, CARD_STATS)
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кешей лент и карточек постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счётчики после вывода.')
+
+    def handle(self, *args, **options):
+        for name in STATS:
+            hits, misses = get_stats(name)
+            total = hits + misses
+            ratio = hits / total * 100 if total else 0
+            self.stdout.write(
+                f'{name}: попаданий {hits}, промахов {misses}, '
+                f'hit rate {ratio:.1f}%')
+            if options['reset']:
+                reset_stats(name)
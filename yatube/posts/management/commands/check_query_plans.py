@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.pagination import CursorPaginator
+from core.profiling import explain, plan_problems
+from posts import views
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Маленькие таблицы, которые читаются целиком: группы — список
+# выбора в форме поста.
+ALLOWED_SCANS = ('posts_group',)
+PLAN_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'check-query-plans',
+}}
+
+
+def view_requests():
+    """Запросы к страницам posts на данных текущей базы.
+
+    Возвращает пользователя, под которым открываются страницы, и список
+    ``(страница, метод, адрес, данные)``.
+    """
+    author = User.objects.order_by('-stats__posts_count').first()
+    reader = User.objects.annotate(
+        followed=Count('follower')).order_by('-followed').first()
+    post = Post.objects.order_by('-comments_count').first()
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total').first()
+    if not (author and reader and post):
+        raise CommandError('В базе нет постов: выполните manage.py seed.')
+    own_post = Post.objects.filter(author=reader).first() or post
+    comments_cursor = CursorPaginator(
+        post.comments.all(), views.COMMENTS_PER_PAGE,
+        views.COMMENTS_ORDERING).get_page().next_cursor
+    requests = [
+        ('posts:index', 'get', reverse('posts:index'), None),
+        ('posts:search', 'get', reverse('posts:search'),
+         {'q': post.text.split()[0]}),
+        ('posts:profile', 'get',
+         reverse('posts:profile', args=(author.username,)), None),
+        ('posts:post_detail', 'get',
+         reverse('posts:post_detail', args=(post.id,)), None),
+        ('posts:post_comments', 'get',
+         reverse('posts:post_comments', args=(post.id,)),
+         {'cursor': comments_cursor or ''}),
+        ('posts:post_create', 'get', reverse('posts:post_create'), None),
+        ('posts:post_edit', 'get',
+         reverse('posts:post_edit', args=(own_post.id,)), None),
+        ('posts:add_comment', 'post',
+         reverse('posts:add_comment', args=(post.id,)),
+         {'text': 'Проверка плана'}),
+        ('posts:follow_index', 'get', reverse('posts:follow_index'), None),
+        ('posts:profile_follow', 'get',
+         reverse('posts:profile_follow', args=(author.username,)), None),
+        ('posts:profile_unfollow', 'get',
+         reverse('posts:profile_unfollow', args=(author.username,)), None),
+        ('posts:export', 'get', reverse('posts:export'), {'format': 'csv'}),
+    ]
+    if group:
+        requests.append(('posts:group_list', 'get',
+                         reverse('posts:group_list', args=(group.slug,)),
+                         None))
+    return reader, requests
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов каждой страницы '
+            'posts и завершается с ошибкой при полном просмотре таблицы '
+            'или сортировке во временном B-дереве.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Планы проверяются только на SQLite.')
+        failed = 0
+        # Страницы открываются с пустым кешем, а изменения базы
+        # (комментарий, подписка, сессия) откатываются.
+        with override_settings(CACHES=PLAN_CACHES), transaction.atomic():
+            user, requests = view_requests()
+            client = Client()
+            client.force_login(user)
+            for name, method, url, data in requests:
+                with CaptureQueriesContext(connection) as context:
+                    response = getattr(client, method)(url, data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                failed += self.check_view(
+                    name, context.captured_queries, options['verbose_plans'])
+            transaction.set_rollback(True)
+        if failed:
+            raise CommandError(f'Плохих планов запросов: {failed}.')
+        self.stdout.write(self.style.SUCCESS('Все планы запросов в порядке.'))
+
+    def check_view(self, name, queries, verbose):
+        failed = 0
+        self.stdout.write(name)
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            problems = plan_problems(plan, ALLOWED_SCANS)
+            if not (problems or verbose):
+                continue
+            style = self.style.ERROR if problems else str
+            self.stdout.write(style(f'  {sql}'))
+            for step in plan:
+                marker = '!' if step in problems else ' '
+                self.stdout.write(style(f'   {marker} {step}'))
+            failed += bool(problems)
+        return failed
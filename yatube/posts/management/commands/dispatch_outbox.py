@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import outbox
+from posts.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = ('Доставляет события outbox обработчикам по порядку. '
+            'Запускайте в одном экземпляре при YATUBE_OUTBOX_EAGER=0.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=outbox.BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Пауза в секундах, когда событий нет.')
+        parser.add_argument('--once', action='store_true',
+                            help='Доставить накопленное и завершиться.')
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help='Сначала вернуть в очередь события '
+                                 'с ошибкой.')
+
+    def handle(self, *args, **options):
+        if options['requeue_failed']:
+            requeued = outbox.requeue_failed()
+            self.stdout.write(f'Возвращено в очередь: {requeued}.')
+        delivered = 0
+        while True:
+            count = outbox.dispatch(options['batch_size'])
+            delivered += count
+            if count:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        failed = OutboxEvent.objects.filter(
+            status=OutboxEvent.FAILED).count()
+        pending = OutboxEvent.objects.filter(
+            status=OutboxEvent.PENDING).count()
+        self.stdout.write(f'Доставлено событий: {delivered}, в очереди: '
+                          f'{pending}, с ошибкой: {failed}.')
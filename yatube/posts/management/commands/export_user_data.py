@@ -0,0 +1,37 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии и подписки пользователя '
+            'в NDJSON, CSV или zip с картинками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', default='ndjson',
+                            choices=sorted(export.FORMATS))
+        parser.add_argument('--output', default='-',
+                            help='Файл выгрузки, «-» — стандартный вывод.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.')
+        if options['output'] == '-':
+            self.write(user, options['format'], sys.stdout.buffer)
+        else:
+            with open(options['output'], 'wb') as output:
+                self.write(user, options['format'], output)
+
+    def write(self, user, export_format, output):
+        for chunk in export.export_chunks(user, export_format):
+            output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        output.flush()
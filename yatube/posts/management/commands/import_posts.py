@@ -0,0 +1,258 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import explicit_pub_date
+from posts import cache, counters, search, timeline
+from posts.models import (Comment, Group, ImportCheckpoint, ImportedPost,
+                          Post)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты и комментарии из NDJSON пачками bulk_create. '
+            'Строка — объект с полем type: post (id, author, group, text, '
+            'pub_date, image) или comment (post — id поста из файла, '
+            'author, text, pub_date). Формат совместим с export_user_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON.')
+        parser.add_argument('--author',
+                            help='Автор строк без поля author.')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Создавать неизвестных авторов и группы; '
+                                 'иначе такие строки пропускаются.')
+        parser.add_argument('--images-dir',
+                            help='Откуда копировать картинки в '
+                                 'MEDIA_ROOT/posts/. Без него поле image '
+                                 'считается именем в хранилище.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков копирования картинок.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк на транзакцию.')
+        parser.add_argument('--checkpoint',
+                            help='Имя контрольной точки в базе '
+                                 '(по умолчанию — полный путь файла).')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с контрольной точки.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = options['checkpoint'] or os.path.abspath(path)
+        self.create_missing = options['create_missing']
+        self.images_dir = options['images_dir']
+        self.default_author = options['author']
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        # Номер поста в файле -> id в базе, для комментариев.
+        self.post_ids = {}
+        self.stats = dict.fromkeys(('posts', 'comments', 'skipped'), 0)
+        if options['resume']:
+            self.load_checkpoint(name)
+        else:
+            ImportCheckpoint.objects.filter(name=name).delete()
+            self.checkpoint = ImportCheckpoint.objects.create(name=name)
+        line_number = self.checkpoint.line
+        offset = self.checkpoint.offset
+        total_size = os.path.getsize(path)
+        started = time.perf_counter()
+        first_line = line_number
+
+        with explicit_pub_date(Post, Comment), \
+                ThreadPoolExecutor(options['workers']) as pool, \
+                open(path, 'rb') as file:
+            file.seek(offset)
+            batch = []
+            for line in file:
+                line_number += 1
+                offset += len(line)
+                if line.strip():
+                    batch.append((line_number, line))
+                if len(batch) == options['batch_size']:
+                    self.import_batch(batch, pool, line_number, offset)
+                    batch = []
+                    self.progress(line_number - first_line, offset,
+                                  total_size, started)
+            if batch:
+                self.import_batch(batch, pool, line_number, offset)
+                self.progress(line_number - first_line, offset, total_size,
+                              started)
+
+        self.checkpoint.delete()
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса...')
+        counters.rebuild()
+        timeline.rebuild()
+        search.rebuild()
+        cache.invalidate_all_feeds(cards=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Постов: {self.stats["posts"]}, комментариев: '
+            f'{self.stats["comments"]}, пропущено строк: '
+            f'{self.stats["skipped"]}. Миниатюры: '
+            f'manage.py warm_thumbnails.'))
+
+    def load_checkpoint(self, name):
+        self.checkpoint = ImportCheckpoint.objects.filter(name=name).first()
+        if self.checkpoint is None:
+            raise CommandError(f'Нет контрольной точки {name}.')
+        self.post_ids.update(self.checkpoint.posts.values_list(
+            'source_id', 'post_id'))
+        self.stdout.write(f'Продолжение со строки {self.checkpoint.line + 1}.')
+
+    def save_checkpoint(self, line_number, offset, new_ids):
+        ImportedPost.objects.bulk_create(
+            ImportedPost(checkpoint=self.checkpoint, source_id=source_id,
+                         post_id=post_id)
+            for source_id, post_id in new_ids)
+        ImportCheckpoint.objects.filter(pk=self.checkpoint.pk).update(
+            line=line_number, offset=offset)
+
+    def progress(self, lines, offset, total_size, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  {offset / max(total_size, 1):6.1%}  строк: {lines}, '
+            f'постов: {self.stats["posts"]}, комментариев: '
+            f'{self.stats["comments"]}, пропущено: {self.stats["skipped"]}, '
+            f'{lines / max(elapsed, 1e-9):.0f} строк/с')
+
+    def parse(self, batch):
+        rows = []
+        for line_number, line in batch:
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {line_number}: {error}.')
+            rows.append(row)
+        return rows
+
+    def import_batch(self, batch, pool, line_number, offset):
+        """Загружает пачку и сдвигает контрольную точку за неё.
+
+        Точка пишется в той же транзакции: после сбоя пачка либо
+        загружена вместе с ней, либо не загружена вовсе.
+        """
+        rows = self.parse(batch)
+        posts = [row for row in rows if row.get('type', 'post') == 'post']
+        comments = [row for row in rows if row.get('type') == 'comment']
+        self.stats['skipped'] += len(rows) - len(posts) - len(comments)
+        # Картинки копируются до транзакции, параллельно.
+        images = list(pool.map(self.copy_image,
+                               (row.get('image') for row in posts)))
+        try:
+            with transaction.atomic():
+                self.create_missing_objects(rows)
+                new_ids = self.create_posts(posts, images)
+                self.create_comments(comments)
+                self.save_checkpoint(line_number, offset, new_ids)
+        except BaseException:
+            if self.images_dir:
+                # Копии картинок откаченной пачки никому не нужны.
+                for name in filter(None, images):
+                    default_storage.delete(name)
+            raise
+
+    def copy_image(self, name):
+        if not name:
+            return ''
+        if not self.images_dir:
+            return name
+        source = os.path.join(self.images_dir, name)
+        if not os.path.exists(source):
+            # Распакованный zip выгрузки хранит картинки без подпапки.
+            source = os.path.join(self.images_dir, os.path.basename(name))
+        if not os.path.exists(source):
+            return ''
+        with open(source, 'rb') as file:
+            return default_storage.save(
+                f'posts/{os.path.basename(name)}', File(file))
+
+    def author_id(self, row):
+        return self.users.get(row.get('author') or self.default_author)
+
+    def create_missing_objects(self, rows):
+        if not self.create_missing:
+            return
+        usernames = {row.get('author') or self.default_author
+                     for row in rows} - set(self.users) - {None}
+        slugs = {row['group'] for row in rows
+                 if row.get('group')} - set(self.groups)
+        if usernames:
+            User.objects.bulk_create(
+                User(username=username, password=make_password(None))
+                for username in usernames)
+            self.users.update(User.objects.filter(
+                username__in=usernames).values_list('username', 'id'))
+        if slugs:
+            Group.objects.bulk_create(
+                Group(title=slug, slug=slug, description='')
+                for slug in slugs)
+            self.groups.update(Group.objects.filter(
+                slug__in=slugs).values_list('slug', 'id'))
+
+    def create_posts(self, rows, images):
+        posts, source_ids = [], []
+        now = timezone.now()
+        for row, image in zip(rows, images):
+            author_id = self.author_id(row)
+            if author_id is None or not row.get('text') or (
+                    row.get('group') and row['group'] not in self.groups):
+                self.stats['skipped'] += 1
+                continue
+            posts.append(Post(
+                text=row['text'], author_id=author_id,
+                group_id=self.groups.get(row.get('group')), image=image,
+                pub_date=self.pub_date(row, now)))
+            source_ids.append(row.get('id'))
+        if not posts:
+            return []
+        last_id = Post.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        Post.objects.bulk_create(posts)
+        # SQLite не возвращает id из bulk_create: в транзакции новые
+        # строки получают id подряд после last_id.
+        post_ids = [post.pk for post in posts]
+        if None in post_ids:
+            post_ids = list(Post.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True))
+            if len(post_ids) != len(posts):
+                raise CommandError('Посты добавлялись во время загрузки: '
+                                   'повторите с --resume.')
+        self.stats['posts'] += len(posts)
+        new_ids = [(str(source_id), post_id)
+                   for source_id, post_id in zip(source_ids, post_ids)
+                   if source_id is not None]
+        self.post_ids.update(new_ids)
+        return new_ids
+
+    def create_comments(self, rows):
+        comments = []
+        now = timezone.now()
+        for row in rows:
+            author_id = self.author_id(row)
+            post_id = self.post_ids.get(str(row.get('post')))
+            if author_id is None or post_id is None or not row.get('text'):
+                self.stats['skipped'] += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id, author_id=author_id, text=row['text'],
+                pub_date=self.pub_date(row, now)))
+        Comment.objects.bulk_create(comments)
+        self.stats['comments'] += len(comments)
+
+    def pub_date(self, row, default):
+        value = row.get('pub_date') and parse_datetime(row['pub_date'])
+        if not value:
+            return default
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
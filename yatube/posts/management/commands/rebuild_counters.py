@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache, counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        # Счётчики видны в карточках и лентах: сбрасываем их целиком.
+        cache.invalidate_all_feeds(cards=True)
+        self.stdout.write('Счётчики пересчитаны.')
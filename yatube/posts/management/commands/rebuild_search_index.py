@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс постов и комментариев заново.'
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        engine = 'FTS5' if search.use_fts() else 'обратный индекс'
+        self.stdout.write(f'Поисковый индекс перестроен ({engine}).')
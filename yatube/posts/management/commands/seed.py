@@ -0,0 +1,209 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from core.models import explicit_pub_date
+from posts import cache, counters, search, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SEED_PASSWORD = 'seed-password'
+SYLLABLES = ('ка', 'ло', 'ми', 'ра', 'ну', 'те', 'во', 'сы', 'да', 'же',
+             'по', 'ри', 'мо', 'ле', 'ша', 'гу', 'зо', 'пе')
+IMAGE_SIZE = (1600, 1000)
+
+
+def zipf_weights(size, exponent=1.0):
+    """Накопленные веса закона Ципфа для ``random.choices``."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем.')
+        parser.add_argument('--images', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--image-files', type=int, default=10,
+                            help='Сколько разных картинок создать.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        self.created = {}
+        self.words = self.vocabulary(5000)
+        self.word_weights = zipf_weights(len(self.words))
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        # Популярность авторов распределена по степенному закону:
+        # немногие пишут много и собирают большинство подписчиков.
+        authors = user_ids[:]
+        self.rng.shuffle(authors)
+        author_weights = zipf_weights(len(authors), 1.1)
+        images = self.create_images(options['image_files'])
+        post_ids = self.create_posts(
+            options['posts'], authors, author_weights, group_ids, images,
+            options['images'])
+        self.create_comments(options['comments'], post_ids, user_ids)
+        self.create_follows(options['follows'], user_ids, authors,
+                            author_weights)
+
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса...')
+        counters.rebuild()
+        timeline.rebuild()
+        search.rebuild()
+        cache.invalidate_all_feeds(cards=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Пароль пользователей seed_*: {SEED_PASSWORD}. '
+            f'Миниатюры: manage.py warm_thumbnails.'))
+
+    def vocabulary(self, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(self.rng.choice(SYLLABLES)
+                              for _ in range(self.rng.randint(1, 4))))
+        return sorted(words)
+
+    def text(self, min_words, max_words):
+        return ' '.join(self.rng.choices(
+            self.words, cum_weights=self.word_weights,
+            k=self.rng.randint(min_words, max_words))).capitalize()
+
+    def pub_date(self):
+        return self.now - timedelta(seconds=self.rng.randint(
+            0, self.days * 24 * 60 * 60))
+
+    def bulk_create(self, model, objects, total, **kwargs):
+        """Создаёт объекты пачками, по транзакции на пачку."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                self.flush(model, batch, total, **kwargs)
+                batch = []
+        if batch:
+            self.flush(model, batch, total, **kwargs)
+
+    def flush(self, model, batch, total, **kwargs):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **kwargs)
+        self.created[model] = self.created.get(model, 0) + len(batch)
+        self.stdout.write(f'  {model._meta.verbose_name_plural}: '
+                          f'{self.created[model]}/{total}')
+
+    def create_users(self, total):
+        offset = User.objects.filter(username__startswith='seed_').count()
+        password = make_password(SEED_PASSWORD)
+        self.bulk_create(User, (
+            User(username=f'seed_{number}', password=password,
+                 first_name=self.text(1, 1), last_name=self.text(1, 1))
+            for number in range(offset, offset + total)), total)
+        return list(User.objects.filter(
+            username__startswith='seed_').values_list('id', flat=True))
+
+    def create_groups(self, total):
+        offset = Group.objects.filter(slug__startswith='seed-').count()
+        self.bulk_create(Group, (
+            Group(title=self.text(1, 3), slug=f'seed-{number}',
+                  description=self.text(5, 20))
+            for number in range(offset, offset + total)), total)
+        return list(Group.objects.filter(
+            slug__startswith='seed-').values_list('id', flat=True))
+
+    def create_images(self, total):
+        names = []
+        for number in range(total):
+            name = f'posts/seed_{number}.jpg'
+            if not default_storage.exists(name):
+                image = Image.new('RGB', IMAGE_SIZE, tuple(
+                    self.rng.randrange(256) for _ in range(3)))
+                buffer = BytesIO()
+                image.save(buffer, 'JPEG', quality=85)
+                name = default_storage.save(name,
+                                            ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def create_posts(self, total, authors, author_weights, group_ids, images,
+                     image_share):
+        last_id = Post.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+
+        def posts():
+            for _ in range(total):
+                with_group = group_ids and self.rng.random() < 0.8
+                with_image = images and self.rng.random() < image_share
+                yield Post(
+                    text=self.text(5, 80),
+                    author_id=self.rng.choices(
+                        authors, cum_weights=author_weights)[0],
+                    group_id=self.rng.choice(group_ids) if with_group
+                    else None,
+                    image=self.rng.choice(images) if with_image else '',
+                    pub_date=self.pub_date())
+
+        with explicit_pub_date(Post):
+            self.bulk_create(Post, posts(), total)
+        return list(Post.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True))
+
+    def create_comments(self, total, post_ids, user_ids):
+        if not post_ids:
+            return
+        # Комментарии тоже достаются немногим популярным постам.
+        weights = zipf_weights(len(post_ids))
+        popular = post_ids[:]
+        self.rng.shuffle(popular)
+
+        def comments():
+            for _ in range(total):
+                post_id = self.rng.choices(popular, cum_weights=weights)[0]
+                yield Comment(post_id=post_id,
+                              author_id=self.rng.choice(user_ids),
+                              text=self.text(2, 30),
+                              pub_date=self.pub_date())
+
+        with explicit_pub_date(Comment):
+            self.bulk_create(Comment, comments(), total)
+
+    def create_follows(self, average, user_ids, authors, author_weights):
+        def follows():
+            for user_id in user_ids:
+                # Распределение Парето (alpha=1.5) со средним 3:
+                # у большинства мало подписок, у немногих — очень много.
+                count = min(len(authors) - 1, round(
+                    self.rng.paretovariate(1.5) * average / 3))
+                chosen = set(self.rng.choices(
+                    authors, cum_weights=author_weights, k=count))
+                chosen.discard(user_id)
+                for author_id in chosen:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.bulk_create(Follow, follows(), len(user_ids) * average,
+                         ignore_conflicts=True)
@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры всех картинок постов во всех размерах '
+            'шаблонов и выполняет задачи из очереди.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='Число процессов (по умолчанию — ядер).')
+
+    def handle(self, *args, **options):
+        sources = set(Post.objects.exclude(image='').values_list(
+            'image', flat=True))
+        sources.update(ThumbnailJob.objects.exclude(
+            status=ThumbnailJob.DONE).values_list('source', flat=True))
+        sources = sorted(sources)
+        if options['processes'] > 1:
+            # Процессы открывают свои соединения с базой.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                    options['processes'],
+                    initializer=thumbnails.init_worker) as pool:
+                created = sum(pool.map(thumbnails.warm, sources,
+                                       chunksize=16))
+        else:
+            created = sum(map(thumbnails.warm, sources))
+        self.stdout.write(f'Картинок: {len(sources)}, '
+                          f'новых миниатюр: {created}.')
@@ -0,0 +1,88 @@
+"""Быстрый путь лент для анонимных читателей.
+
+Запрос без cookie не может принадлежать вошедшему пользователю,
+а лента для всех таких читателей одинакова. ``AnonymousFeedMiddleware``
+стоит в начале ``MIDDLEWARE`` и отдаёт её из кеша, не доходя до сессий,
+CSRF, аутентификации и шаблонов. При промахе запрос проходит обычный
+путь, и ответ сохраняется, если не поставил cookie.
+
+Ключ включает версии ленты, как в ``cache_feed``, поэтому изменения
+видны сразу. Ответ помечается ``Cache-Control: public``; ``Vary: Cookie``
+остаётся, чтобы прокси не отдал анонимную ленту вошедшему.
+"""
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date
+
+from core.cache import get_versions, record
+from core.conditional import versions_etag, versions_last_modified
+
+from . import views
+from .cache import ALL_FEEDS_VERSION, FEED_TIMEOUT, key_hash
+
+ANONYMOUS_FEED_STATS = 'anonymous_feed'
+
+# Ленты, которые аноним видит одинаково, и ключи их версий.
+FEEDS = {
+    'posts:index': views.index_versions,
+    'posts:group_list': views.group_versions,
+    'posts:profile': views.profile_versions,
+}
+
+
+class AnonymousFeedMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        version_keys = self.version_keys(request)
+        if version_keys is None:
+            return self.get_response(request)
+        versions = get_versions(version_keys)
+        path = request.get_full_path()
+        key = (f'anonymous_feed:{key_hash(path)}:'
+               f'{key_hash(".".join(str(version) for version in versions))}')
+        content = cache.get(key)
+        record(ANONYMOUS_FEED_STATS, hit=content is not None)
+        if content is None:
+            response = self.get_response(request)
+            # Ответ общий, только если лента прошла через cache_feed
+            # и не завела сессию или CSRF-cookie.
+            if (response.status_code != HTTPStatus.OK or response.cookies
+                    or getattr(request, 'feed_version_keys', None)
+                    != version_keys):
+                return response
+            cache.set(key, response.content, FEED_TIMEOUT)
+        else:
+            response = HttpResponse(content)
+            response['ETag'] = versions_etag(path, 0, versions)
+            last_modified = versions_last_modified(versions).timestamp()
+            response['Last-Modified'] = http_date(last_modified)
+            response['X-Frame-Options'] = getattr(
+                settings, 'X_FRAME_OPTIONS', 'SAMEORIGIN')
+            response = get_conditional_response(
+                request, etag=response['ETag'],
+                last_modified=int(last_modified), response=response)
+        patch_vary_headers(response, ('Cookie',))
+        patch_cache_control(response, public=True,
+                            max_age=settings.ANONYMOUS_FEED_MAX_AGE)
+        return response
+
+    def version_keys(self, request):
+        """Ключи версий ленты или None, если быстрый путь неприменим."""
+        if request.method != 'GET' or request.COOKIES:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        get_version_keys = FEEDS.get(match.view_name)
+        if get_version_keys is None:
+            return None
+        return [ALL_FEEDS_VERSION, *get_version_keys(request, **match.kwargs)]
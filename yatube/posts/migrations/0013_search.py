@@ -0,0 +1,93 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:45
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия posts.search на момент миграции: дальнейшие изменения модуля
+# не должны менять то, что она строит.
+FTS_TABLE = 'posts_search'
+TEXT_WEIGHT = 2
+COMMENT_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+WORD_RE = re.compile(r'[^\W_]+')
+CREATE_FTS_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    f"text, comments, tokenize = 'unicode61 remove_diacritics 0')"
+)
+FILL_FTS_SQL = (
+    f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+    f'SELECT post.id, post.text, COALESCE(('
+    f"SELECT group_concat(comment.text, ' ') FROM posts_comment comment "
+    f"WHERE comment.post_id = post.id), '') FROM posts_post post"
+)
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(text.lower())]
+
+
+def term_weights(text, comments):
+    weights = Counter()
+    for term in tokenize(text):
+        weights[term] += TEXT_WEIGHT
+    for term in tokenize(comments):
+        weights[term] += COMMENT_WEIGHT
+    return weights
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def build_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if fts5_available(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_FTS_SQL)
+            cursor.execute(FILL_FTS_SQL)
+        return
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    SearchEntry = apps.get_model('posts', 'SearchEntry')
+    for post_id, text in Post.objects.values_list('id', 'text').iterator():
+        comments = ' '.join(Comment.objects.filter(
+            post_id=post_id).values_list('text', flat=True))
+        SearchEntry.objects.bulk_create(
+            (SearchEntry(term=term, post_id=post_id, weight=weight)
+             for term, weight in term_weights(text, comments).items()))
+
+
+def drop_index(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term_post'),
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:16
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='next_try',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Не раньше'),
+        ),
+    ]
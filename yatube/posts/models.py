@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 import constants as c
 from core.models import CreatedModel
@@ -19,12 +20,24 @@ class Post(CreatedModel):
                               'будет относиться пост',)
     image = models.ImageField('Картинка',
                               upload_to='posts/', blank=True,)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0,
+                                                 editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'posts'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты автора и группы читаются по убыванию (pub_date, id):
+        # SQLite проходит индекс в обратном порядке без сортировки.
+        indexes = [
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date'),
+            # Готовая миниатюра ищет посты со своей картинкой.
+            models.Index(fields=['image'], name='post_image'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:c.LEN_OF_STR_METHOD_IN_POST]
@@ -50,6 +63,10 @@ class Comment(CreatedModel):
                                related_name='comments',)
     text = models.TextField(verbose_name='Текст поста',)
 
+    class Meta:
+        indexes = [models.Index(fields=['post', 'pub_date'],
+                                name='comment_post_pub_date')]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -60,3 +77,157 @@ class Follow(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(
             fields=['user', 'author'], name='unique_user_author')]
+        # Подписчики автора (раскладка постов по лентам, счётчики).
+        indexes = [models.Index(fields=['author', 'user'],
+                                name='follow_author_user')]
+
+
+class TimelineEntry(models.Model):
+    """Запись домашней ленты подписчика (fan-out on write)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    # Копия Post.pub_date: лента читается диапазоном по индексу
+    # (user, pub_date, post) без сортировки во временном B-дереве.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_timeline_user_post')]
+        indexes = [models.Index(fields=['user', 'pub_date', 'post'],
+                                name='timeline_user_pub_date_post')]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами через F-выражения, пересчитываются
+    командой ``manage.py rebuild_counters``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class SearchEntry(models.Model):
+    """Запись обратного индекса поиска: слово → пост.
+
+    Используется, когда база не поддерживает SQLite FTS5.
+    ``weight`` — сколько раз слово встречается в посте (слова текста
+    считаются с весом 2, слова комментариев — с весом 1).
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='search_entries')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'post'], name='unique_search_term_post')]
+
+
+class ThumbnailJob(models.Model):
+    """Задача на создание миниатюры картинки поста."""
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    source = models.CharField('Картинка', max_length=255)
+    geometry = models.CharField('Размер', max_length=64)
+    options = models.CharField('Параметры', max_length=255)
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Выполнена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Задача миниатюры'
+        verbose_name_plural = 'Задачи миниатюр'
+        constraints = [models.UniqueConstraint(
+            fields=['source', 'geometry', 'options'],
+            name='unique_thumbnail_job')]
+        indexes = [models.Index(fields=['status'],
+                                name='thumbnail_job_status')]
+
+    def __str__(self):
+        return f'{self.source} {self.geometry}'
+
+
+class OutboxEvent(models.Model):
+    """Событие изменения модели для обработчиков ``posts.outbox``.
+
+    Пишется в той же транзакции, что и изменение; доставленные
+    события удаляются.
+    """
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (FAILED, 'Ошибка'),
+    )
+
+    topic = models.CharField('Тема', max_length=64)
+    payload = models.TextField('Данные')
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_try = models.DateTimeField('Не раньше', default=timezone.now)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Событие'
+        verbose_name_plural = 'События'
+        indexes = [models.Index(fields=['status', 'id'],
+                                name='outbox_status_id')]
+
+    def __str__(self):
+        return f'{self.topic} {self.payload}'
+
+
+class ImportCheckpoint(models.Model):
+    """Контрольная точка ``manage.py import_posts``.
+
+    Меняется в той же транзакции, что и загруженная пачка строк,
+    поэтому после сбоя загрузка продолжается ровно после неё.
+    """
+    name = models.CharField('Загрузка', max_length=255, unique=True)
+    line = models.PositiveIntegerField('Строка', default=0)
+    offset = models.BigIntegerField('Смещение в файле', default=0)
+    updated = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Контрольная точка загрузки'
+        verbose_name_plural = 'Контрольные точки загрузки'
+
+    def __str__(self):
+        return f'{self.name}: {self.line}'
+
+
+class ImportedPost(models.Model):
+    """Пост загрузки: id из файла → пост в базе, для комментариев."""
+    checkpoint = models.ForeignKey(ImportCheckpoint, on_delete=models.CASCADE,
+                                   related_name='posts')
+    source_id = models.CharField(max_length=255)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='+')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['checkpoint', 'source_id'],
+            name='unique_imported_post_source')]
@@ -0,0 +1,115 @@
+"""Транзакционный outbox: побочные эффекты изменений вне запроса.
+
+Сигнал модели вызывает ``publish()``: событие пишется в таблицу
+``OutboxEvent`` в той же транзакции, что и изменение, и запрос
+завершается сразу после коммита. ``manage.py dispatch_outbox`` читает
+события пачками по порядку id и передаёт их обработчикам,
+зарегистрированным через ``@handler(topic)``.
+
+Доставка — «хотя бы один раз»: обработчик и удаление события идут
+в одной транзакции, но кеш вне её, поэтому обработчики должны быть
+идемпотентными. Ошибка останавливает пачку, чтобы не нарушить
+порядок, и событие повторяется через ``RETRY_DELAY * 2 ** (n - 1)``
+секунд (не больше ``MAX_RETRY_DELAY``); до тех пор следующие события
+ждут. После ``OUTBOX_MAX_ATTEMPTS`` попыток событие получает статус
+FAILED и больше не мешает остальным. ``requeue_failed()``
+(``dispatch_outbox --requeue-failed`` или действие в админке)
+возвращает такие события в очередь после исправления обработчика.
+
+При ``OUTBOX_EAGER`` события не сохраняются, а обрабатываются сразу
+после коммита транзакции — так работают тесты и сервер разработки
+без отдельного процесса.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 60 * 60
+
+_handlers = defaultdict(list)
+
+
+def handler(topic):
+    """Регистрирует обработчик событий ``topic``."""
+    def decorator(func):
+        _handlers[topic].append(func)
+        return func
+    return decorator
+
+
+def get_max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def deliver(topic, payload):
+    for func in _handlers[topic]:
+        func(**payload)
+
+
+def publish(topic, **payload):
+    if getattr(settings, 'OUTBOX_EAGER', False):
+        transaction.on_commit(partial(deliver, topic, payload))
+        return
+    OutboxEvent.objects.create(topic=topic, payload=json.dumps(payload))
+
+
+def dispatch(batch_size=BATCH_SIZE):
+    """Доставляет пачку событий; возвращает число доставленных.
+
+    Запускать в одном процессе: параллельные диспетчеры нарушили бы
+    порядок событий.
+    """
+    events = OutboxEvent.objects.filter(
+        status=OutboxEvent.PENDING).order_by('id')[:batch_size]
+    delivered = 0
+    now = timezone.now()
+    for event in events:
+        if event.next_try > now:
+            # Событие ждёт повтора, а следующие — его.
+            break
+        try:
+            with transaction.atomic():
+                deliver(event.topic, json.loads(event.payload))
+                event.delete()
+        except Exception as error:
+            logger.exception('Событие %s %s не доставлено',
+                             event.id, event.topic)
+            event.attempts += 1
+            event.error = repr(error)
+            if event.attempts >= get_max_attempts():
+                event.status = OutboxEvent.FAILED
+            else:
+                event.next_try = timezone.now() + timedelta(seconds=min(
+                    MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (event.attempts - 1)))
+            event.save(update_fields=('attempts', 'error', 'status',
+                                      'next_try'))
+            if event.status == OutboxEvent.PENDING:
+                break
+            continue
+        delivered += 1
+    return delivered
+
+
+def requeue_failed(queryset=None):
+    """Возвращает события FAILED в очередь; возвращает их число.
+
+    События доставляются по порядку id, то есть раньше новых, хотя
+    более поздние уже могли быть доставлены.
+    """
+    if queryset is None:
+        queryset = OutboxEvent.objects.all()
+    return queryset.filter(status=OutboxEvent.FAILED).update(
+        status=OutboxEvent.PENDING, attempts=0, error='',
+        next_try=timezone.now())
@@ -0,0 +1,291 @@
+"""Полнотекстовый поиск по постам и их комментариям.
+
+На SQLite со сборкой FTS5 поиск идёт по виртуальной таблице
+``posts_search`` и ранжируется bm25. На других базах (или при
+``SEARCH_BACKEND = 'python'``) используется обратный индекс
+в таблице ``SearchEntry`` с ранжированием tf-idf. Индекс
+обновляется сигналами при изменении постов и комментариев.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              Sum, Value, When)
+
+from .models import Comment, Post, SearchEntry
+
+FTS_TABLE = 'posts_search'
+TEXT_WEIGHT = 2
+COMMENT_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+BATCH_SIZE = 1000
+
+# Слова — последовательности букв и цифр, как у токенизатора unicode61.
+WORD_RE = re.compile(r'[^\W_]+')
+
+CREATE_FTS_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    f"text, comments, tokenize = 'unicode61 remove_diacritics 0')"
+)
+FILL_FTS_SQL = (
+    f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+    f'SELECT post.id, post.text, COALESCE(('
+    f"SELECT group_concat(comment.text, ' ') FROM posts_comment comment "
+    f"WHERE comment.post_id = post.id), '') FROM posts_post post"
+)
+
+
+def tokenize(text):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(text.lower())]
+
+
+def term_weights(text, comments):
+    weights = Counter()
+    for term in tokenize(text):
+        weights[term] += TEXT_WEIGHT
+    for term in tokenize(comments):
+        weights[term] += COMMENT_WEIGHT
+    return weights
+
+
+def fts5_available(db_connection):
+    if db_connection.vendor != 'sqlite':
+        return False
+    with db_connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+@lru_cache(maxsize=None)
+def _default_fts5_available():
+    return fts5_available(connection)
+
+
+def use_fts():
+    if getattr(settings, 'SEARCH_BACKEND', 'auto') == 'python':
+        return False
+    return _default_fts5_available()
+
+
+def _comments_text(post_id):
+    return ' '.join(
+        Comment.objects.filter(post_id=post_id).values_list('text', flat=True))
+
+
+def index_post(post):
+    """Переиндексирует пост вместе с его комментариями."""
+    comments = _comments_text(post.id)
+    with transaction.atomic():
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [post.id])
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+                    f'VALUES (%s, %s, %s)', [post.id, post.text, comments])
+            return
+        SearchEntry.objects.filter(post_id=post.id).delete()
+        SearchEntry.objects.bulk_create(
+            (SearchEntry(term=term, post_id=post.id, weight=weight)
+             for term, weight in term_weights(post.text, comments).items()))
+
+
+def index_comment(post, added='', removed=''):
+    """Добавляет в индекс поста текст ``added`` и убирает ``removed``.
+
+    Остальные комментарии поста не перечитываются: меняются только
+    веса слов одного комментария.
+    """
+    with transaction.atomic():
+        if use_fts():
+            if not _change_fts_comments(post.id, added, removed):
+                # Строки поста нет или текст не нашёлся: индекс
+                # разошёлся с базой, строим строку заново.
+                index_post(post)
+            return
+        deltas = Counter()
+        for term in tokenize(added):
+            deltas[term] += COMMENT_WEIGHT
+        for term in tokenize(removed):
+            deltas[term] -= COMMENT_WEIGHT
+        _change_entries(post.id, deltas)
+
+
+def _comment_pattern(text):
+    """Текст комментария, не разрезающий соседние слова склейки."""
+    pattern = re.escape(text)
+    if WORD_RE.match(text[0]):
+        pattern = r'(?<![^\W_])' + pattern
+    if WORD_RE.match(text[-1]):
+        pattern += r'(?![^\W_])'
+    return re.compile(pattern)
+
+
+def _change_fts_comments(post_id, added, removed):
+    with connection.cursor() as cursor:
+        if not removed:
+            # Добавление — дописывание в конец, без чтения строки.
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET comments = comments || ' ' || %s "
+                f'WHERE rowid = %s', [added, post_id])
+            return cursor.rowcount > 0
+        cursor.execute(f'SELECT comments FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        comments, found = _comment_pattern(removed).subn(' ', row[0], 1)
+        if not found:
+            return False
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET comments = %s WHERE rowid = %s',
+            [f'{comments} {added}' if added else comments, post_id])
+    return True
+
+
+def _change_entries(post_id, deltas):
+    """Меняет веса слов поста на ``deltas`` в обратном индексе."""
+    deltas = {term: delta for term, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    entries = SearchEntry.objects.filter(post_id=post_id)
+    existing = set(entries.filter(term__in=list(deltas)).values_list(
+        'term', flat=True))
+    SearchEntry.objects.bulk_create(
+        SearchEntry(term=term, post_id=post_id, weight=delta)
+        for term, delta in deltas.items()
+        if delta > 0 and term not in existing)
+    # Один UPDATE на каждое значение прироста, обычно их один-два.
+    terms_by_delta = {}
+    for term in existing:
+        terms_by_delta.setdefault(deltas[term], []).append(term)
+    for delta, terms in terms_by_delta.items():
+        entries.filter(term__in=terms).update(weight=F('weight') + delta)
+    if any(delta < 0 for delta in deltas.values()):
+        entries.filter(term__in=existing, weight__lte=0).delete()
+
+
+def unindex_post(post_id):
+    # Записи SearchEntry удаляются каскадом вместе с постом.
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+
+def rebuild():
+    """Строит индекс текущего движка заново."""
+    with transaction.atomic():
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                cursor.execute(FILL_FTS_SQL)
+            return
+        SearchEntry.objects.all().delete()
+        posts = Post.objects.order_by('id').values_list('id', 'text')
+        last_id = 0
+        while True:
+            batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            comments = {}
+            for post_id, text in Comment.objects.filter(
+                    post_id__in=[post_id for post_id, _ in batch]
+            ).values_list('post_id', 'text'):
+                comments.setdefault(post_id, []).append(text)
+            SearchEntry.objects.bulk_create(
+                (SearchEntry(term=term, post_id=post_id, weight=weight)
+                 for post_id, text in batch
+                 for term, weight in term_weights(
+                     text, ' '.join(comments.get(post_id, ()))).items()))
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности.
+
+    Ведёт себя как последовательность для ``Paginator``: ``count()``
+    и срез выполняются отдельными запросами, в память попадает
+    только запрошенная страница.
+    """
+
+    def __init__(self, query):
+        self.terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        self._count = None
+
+    def _match(self):
+        return ' '.join(f'"{term}"' for term in self.terms)
+
+    def _ranked_entries(self):
+        """Посты, содержащие все слова запроса, с их весом tf-idf."""
+        entries = SearchEntry.objects.filter(term__in=self.terms)
+        frequencies = dict(entries.order_by().values('term').annotate(
+            posts=Count('id')).values_list('term', 'posts'))
+        if len(frequencies) < len(self.terms):
+            return None
+        # Кандидаты — посты с самым редким словом запроса: остальные
+        # слова проверяются только среди них.
+        if len(self.terms) > 1:
+            rarest = min(frequencies, key=frequencies.get)
+            entries = entries.filter(post__in=SearchEntry.objects.filter(
+                term=rarest).values('post'))
+        total = Post.objects.count()
+        score = Case(*(
+            When(term=term, then=ExpressionWrapper(
+                F('weight') * Value(math.log(1 + total / posts)),
+                output_field=FloatField()))
+            for term, posts in frequencies.items()),
+            output_field=FloatField())
+        return (entries.values('post')
+                .annotate(matched=Count('id'), score=Sum(score))
+                .filter(matched=len(self.terms))
+                .order_by('-score', '-post'))
+
+    def count(self):
+        if self._count is None:
+            self._count = self._fetch_count() if self.terms else 0
+        return self._count
+
+    def _fetch_count(self):
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT count(*) FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s', [self._match()])
+                return cursor.fetchone()[0]
+        entries = self._ranked_entries()
+        return entries.count() if entries is not None else 0
+
+    def _ids(self, offset, limit):
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY bm25({FTS_TABLE}, {TEXT_WEIGHT}.0, '
+                    f'{COMMENT_WEIGHT}.0), rowid DESC LIMIT %s OFFSET %s',
+                    [self._match(), limit, offset])
+                return [row[0] for row in cursor.fetchall()]
+        entries = self._ranked_entries()
+        if entries is None:
+            return []
+        return [row['post'] for row in entries[offset:offset + limit]]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.terms or stop <= offset:
+            return []
+        ids = self._ids(offset, stop - offset)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,182 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_versions
+
+from . import cache, counters, outbox, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Посты, которые удаляются в этом потоке. Их комментарии уходят
+# каскадом, а ленты и поисковый индекс обновляет удаление самого поста.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, **kwargs):
+    # Запоминаем прежнюю группу: её лента тоже должна обновиться.
+    if instance.pk:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+    cache.bump_post(instance.id)
+    cache.invalidate_post_feeds(
+        instance, group_ids=[getattr(instance, '_old_group_id', None)],
+        followers=not created)
+    outbox.publish('post.saved', post_id=instance.id, created=created)
+
+
+@receiver(pre_delete, sender=Post)
+def post_pre_delete(sender, instance, **kwargs):
+    _deleting_posts().add(instance.id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.id)
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    cache.bump_post(instance.id)
+    cache.invalidate_post_feeds(instance)
+    outbox.publish('post.deleted', post_id=instance.id)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_pre_save(sender, instance, **kwargs):
+    # Прежний текст убирается из поискового индекса поста.
+    if instance.pk:
+        instance._old_text = Comment.objects.filter(
+            pk=instance.pk).values_list('text', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    cache.bump_post(instance.post_id)
+    cache.invalidate_post_feeds(instance.post)
+    removed = getattr(instance, '_old_text', None) or ''
+    if removed != instance.text:
+        outbox.publish('comment.changed', post_id=instance.post_id,
+                       added=instance.text, removed=removed)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    counters.change_comments_count(instance.post_id, -1)
+    cache.bump_post(instance.post_id)
+    cache.invalidate_post_feeds(instance.post)
+    outbox.publish('comment.changed', post_id=instance.post_id,
+                   added='', removed=instance.text)
+
+
+# Поля, которые видны на страницах помимо карточек: их изменение
+# сбрасывает все ленты.
+GROUP_DISPLAY_FIELDS = ('title', 'slug')
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _display_values(instance, fields):
+    return tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=Group)
+def group_pre_save(sender, instance, **kwargs):
+    if instance.pk:
+        instance._old_display = Group.objects.filter(
+            pk=instance.pk).values_list(*GROUP_DISPLAY_FIELDS).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, signal, created=False, **kwargs):
+    cache.bump_group(instance.id)
+    old_display = getattr(instance, '_old_display', None)
+    old_slug = old_display[1] if old_display else instance.slug
+    bump_versions([cache.GROUP_FEED_VERSION.format(slug)
+                   for slug in {old_slug, instance.slug}])
+    # Новая группа ещё нигде не показана; описание видно только
+    # на странице группы.
+    if signal is post_save and (created or old_display == _display_values(
+            instance, GROUP_DISPLAY_FIELDS)):
+        return
+    cache.invalidate_all_feeds()
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and not (update_fields
+                            and set(update_fields) <= {'last_login'}):
+        instance._old_display = User.objects.filter(
+            pk=instance.pk).values_list(*USER_DISPLAY_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, signal, created=False,
+                 update_fields=None, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        return
+    # Вход, смена пароля или почты не меняют того, что видно в лентах.
+    if signal is post_save and (
+            (update_fields and set(update_fields) <= {'last_login'})
+            or getattr(instance, '_old_display', None) == _display_values(
+                instance, USER_DISPLAY_FIELDS)):
+        return
+    cache.bump_user(instance.id)
+    cache.invalidate_all_feeds()
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+    cache.invalidate_follow_feeds(instance)
+    if created:
+        outbox.publish('follow.created', user_id=instance.user_id,
+                       author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    cache.invalidate_follow_feeds(instance)
+    # Переход порога считается здесь, по счётчику сразу после отписки:
+    # к моменту обработки события счётчик мог измениться ещё.
+    followers = UserStats.objects.filter(
+        user_id=instance.author_id).values_list(
+            'followers_count', flat=True).first()
+    outbox.publish('follow.deleted', user_id=instance.user_id,
+                   author_id=instance.author_id,
+                   backfill=followers == timeline.get_fanout_limit() - 1)
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    thumbnails.start_request()
+
+
+@receiver(request_finished)
+def request_finished_handler(sender, **kwargs):
+    thumbnails.finish_request()
@@ -0,0 +1,27 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cache import render_cards
+
+register = template.Library()
+
+CARDS = 'post_cards'
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста из кеша; ссылка на группу скрыта в ленте группы.
+
+    Первая карточка страницы достаёт из кеша сразу все карточки
+    ``page_obj``.
+    """
+    show_group = not context.get('group')
+    cards = context.render_context.get(CARDS)
+    if cards is None:
+        page_obj = context.get('page_obj')
+        cards = render_cards(list(page_obj) if page_obj else [post],
+                             show_group)
+        context.render_context[CARDS] = cards
+    if post.id not in cards:
+        cards.update(render_cards([post], show_group))
+    return mark_safe(cards[post.id])
@@ -0,0 +1,29 @@
+from django import template
+
+from posts.thumbnails import get_variants
+
+register = template.Library()
+
+# Картинка занимает всю ширину колонки, но не больше 960 пикселей.
+IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+DEFAULT_WIDTH = 960
+
+
+def _srcset(variants):
+    return ', '.join(f'{url} {width}w' for url, width in variants)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """Картинка поста с вариантами разной ширины и формата."""
+    variants = get_variants(post.image)
+    fallback = variants.pop(None, [])
+    src = min(fallback, key=lambda variant: abs(variant[1] - DEFAULT_WIDTH),
+              default=(post.image.url, None))[0]
+    return {
+        'src': src,
+        'srcset': _srcset(fallback),
+        'sources': [(f'image/{image_format.lower()}', _srcset(formatted))
+                    for image_format, formatted in variants.items()],
+        'sizes': IMAGE_SIZES,
+    }
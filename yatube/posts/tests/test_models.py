@@ -1,9 +1,26 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 import constants as c
+from core.cache import get_versions
 
-from ..models import Group, Post
+from .. import counters, outbox, search
+from ..cache import INDEX_VERSION
+from ..management.commands.import_posts import Command as ImportCommand
+from ..models import (Comment, Follow, Group, ImportCheckpoint, ImportedPost,
+                      OutboxEvent, Post, TimelineEntry, UserStats)
 
 User = get_user_model()
 
@@ -74,3 +91,300 @@ class PostsModelsTest(TestCase):
                 self.assertEqual(
                     model._meta.get_field(field).help_text, expected_value
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=c.USERNAME_NOT_AUTHOR)
+        cls.post = Post.objects.create(author=cls.author, text=c.POST_TEXT)
+
+    def assertStats(self, user, posts, followers, following):
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (posts, followers, following))
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text=c.COMMENT_TEXT)
+        self.assertStats(self.author, 1, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertStats(self.author, 1, 0, 0)
+        self.assertStats(self.reader, 0, 0, 0)
+
+    def test_rebuild(self):
+        """rebuild восстанавливает испорченные счётчики."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(posts_count=10, followers_count=10)
+        UserStats.objects.filter(user=self.reader).delete()
+        counters.rebuild()
+        self.assertStats(self.author, 1, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed(self):
+        """seed создаёт данные с согласованными счётчиками и лентами."""
+        call_command('seed', users=20, groups=3, posts=100, comments=150,
+                     follows=5, images=0.5, image_files=2, batch_size=30,
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 150)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            100)
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 150)
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count())
+        self.assertTrue(self.client.login(
+            username='seed_0', password='seed-password'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        self.path = os.path.join(self.directory, 'import.ndjson')
+        with open(os.path.join(self.directory, 'old.gif'), 'wb') as file:
+            file.write(c.SMALL_GIF)
+        self.rows = [
+            {'type': 'post', 'id': 1, 'author': 'legacy_1',
+             'group': 'legacy', 'text': 'Первый пост',
+             'pub_date': '2015-03-01T10:00:00Z', 'image': 'old.gif'},
+            {'type': 'post', 'id': 2, 'author': 'legacy_2',
+             'text': 'Второй пост', 'pub_date': '2015-03-02T10:00:00Z'},
+            {'type': 'comment', 'post': 1, 'author': 'legacy_2',
+             'text': 'Комментарий', 'pub_date': '2015-03-03T10:00:00Z'},
+            {'type': 'comment', 'post': 2, 'author': 'legacy_1',
+             'text': 'Ответ', 'pub_date': '2015-03-04T10:00:00Z'},
+            {'type': 'comment', 'post': 99, 'author': 'legacy_1',
+             'text': 'Без поста'},
+        ]
+
+    def write(self, lines):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(line + '\n' for line in lines)
+
+    def import_posts(self, **options):
+        call_command('import_posts', self.path, create_missing=True,
+                     images_dir=self.directory, batch_size=2,
+                     stdout=StringIO(), **options)
+
+    def assert_imported(self):
+        first = Post.objects.get(text='Первый пост')
+        self.assertEqual(first.author.username, 'legacy_1')
+        self.assertEqual(first.group.slug, 'legacy')
+        self.assertEqual(first.pub_date.year, 2015)
+        self.assertRegex(first.image.name, r'^posts/old\w*\.gif$')
+        self.assertTrue(first.image.storage.exists(first.image.name))
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            set(Comment.objects.values_list('post__text', 'text')),
+            {('Первый пост', 'Комментарий'), ('Второй пост', 'Ответ')})
+        self.assertEqual(
+            UserStats.objects.get(user__username='legacy_2').posts_count, 1)
+
+    def test_import_posts(self):
+        """import_posts создаёт авторов, группы, посты с картинками
+        и комментарии, пропуская строки без поста."""
+        self.write(json.dumps(row) for row in self.rows)
+        self.import_posts()
+        self.assert_imported()
+        self.assertFalse(ImportCheckpoint.objects.exists())
+        self.assertFalse(ImportedPost.objects.exists())
+
+    def test_resume(self):
+        """После ошибки загрузка продолжается с контрольной точки."""
+        lines = [json.dumps(row) for row in self.rows]
+        self.write(lines[:2] + ['{не json'] + lines[2:])
+        with self.assertRaises(CommandError):
+            self.import_posts()
+        self.assertEqual(Post.objects.count(), 2)
+        self.write(lines[:2] + ['{}'] + lines[2:])
+        self.import_posts(resume=True)
+        self.assert_imported()
+
+    def test_failed_batch_rolled_back(self):
+        """Пачка с ошибкой откатывается вместе с контрольной точкой
+        и копиями картинок, а --resume не дублирует посты."""
+        self.write(json.dumps(row) for row in self.rows)
+        images_dir = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        os.makedirs(images_dir, exist_ok=True)
+        images_before = set(os.listdir(images_dir))
+        create_comments = ImportCommand.create_comments
+        calls = []
+
+        def fail_on_call(number):
+            def create(command, rows):
+                calls.append(rows)
+                if len(calls) == number:
+                    raise CommandError('Сбой')
+                create_comments(command, rows)
+            return create
+
+        with mock.patch.object(ImportCommand, 'create_comments',
+                               fail_on_call(1)):
+            with self.assertRaises(CommandError):
+                self.import_posts()
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(set(os.listdir(images_dir)), images_before)
+        calls.clear()
+        with mock.patch.object(ImportCommand, 'create_comments',
+                               fail_on_call(2)):
+            with self.assertRaises(CommandError):
+                self.import_posts(resume=True)
+        self.assertEqual(Post.objects.count(), 2)
+        self.import_posts(resume=True)
+        self.assert_imported()
+        self.assertEqual(len(set(os.listdir(images_dir)) - images_before), 1)
+
+    def test_import_export(self):
+        """Выгрузка export_user_data загружается другому автору."""
+        author = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        User.objects.create_user(username=c.USERNAME_NOT_AUTHOR)
+        post = Post.objects.create(author=author, text=c.POST_TEXT)
+        Comment.objects.create(post=post, author=author, text=c.COMMENT_TEXT)
+        call_command('export_user_data', c.USERNAME_AUTHOR,
+                     output=self.path)
+        call_command('import_posts', self.path, author=c.USERNAME_NOT_AUTHOR,
+                     stdout=StringIO())
+        copy = Post.objects.get(author__username=c.USERNAME_NOT_AUTHOR)
+        # JSON хранит время с точностью до миллисекунд.
+        self.assertEqual((copy.text, copy.pub_date), (
+            post.text, post.pub_date.replace(
+                microsecond=post.pub_date.microsecond // 1000 * 1000)))
+        self.assertEqual(list(copy.comments.values_list('text', flat=True)),
+                         [c.COMMENT_TEXT])
+
+
+@override_settings(OUTBOX_EAGER=True)
+class CommitHooksTest(TestCase):
+    def test_effects_wait_for_commit(self):
+        """Версии лент меняются ещё раз после коммита, а немедленная
+        доставка событий ждёт его."""
+        author = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        with mock.patch.object(outbox, 'deliver') as deliver:
+            with transaction.atomic():
+                Post.objects.create(author=author, text=c.POST_TEXT)
+            # Тест идёт внутри транзакции TestCase: коммита ещё не было.
+            before_commit = get_versions([INDEX_VERSION])
+            deliver.assert_not_called()
+            for _, callback in connection.run_on_commit:
+                callback()
+        self.assertNotEqual(get_versions([INDEX_VERSION]), before_commit)
+        deliver.assert_called_once()
+
+
+@override_settings(OUTBOX_EAGER=False, OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.reader = User.objects.create_user(username=c.USERNAME_NOT_AUTHOR)
+
+    def dispatch(self):
+        call_command('dispatch_outbox', once=True, stdout=StringIO())
+
+    def test_events_dispatched_in_order(self):
+        """Лента и поиск обновляются только после доставки событий."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text=c.POST_TEXT)
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list('topic', flat=True)),
+            ['follow.created', 'post.saved'])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.dispatch()
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual([found.id for found in search.SearchResults(
+            c.POST_TEXT.split()[0])], [post.id])
+
+    def publish_failing(self):
+        calls = []
+        fixed = []
+
+        @outbox.handler('test.fail')
+        def fail(**payload):
+            if not fixed:
+                raise ValueError('сбой')
+        self.addCleanup(outbox._handlers.pop, 'test.fail')
+        outbox.handler('test.ok')(lambda **payload: calls.append(payload))
+        self.addCleanup(outbox._handlers.pop, 'test.ok')
+        outbox.publish('test.fail')
+        outbox.publish('test.ok', number=1)
+        return calls, fixed
+
+    def retry_now(self):
+        OutboxEvent.objects.update(next_try=timezone.now())
+
+    def test_failed_event_retried(self):
+        """Ошибка задерживает следующие события, пока у события есть
+        попытки; повтор — с растущей паузой, затем статус FAILED."""
+        calls, _ = self.publish_failing()
+        with self.assertLogs('posts.outbox'):
+            self.dispatch()
+        event = OutboxEvent.objects.get(topic='test.fail')
+        self.assertEqual((event.status, event.attempts),
+                         (OutboxEvent.PENDING, 1))
+        self.assertGreater(event.next_try, timezone.now())
+        self.assertEqual(calls, [])
+        self.dispatch()
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.retry_now()
+        with self.assertLogs('posts.outbox'):
+            self.dispatch()
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.FAILED)
+        self.assertIn('сбой', event.error)
+        self.assertEqual(calls, [{'number': 1}])
+
+    def test_failed_event_requeued(self):
+        """dispatch_outbox --requeue-failed возвращает событие FAILED
+        в очередь и доставляет его."""
+        calls, fixed = self.publish_failing()
+        for _ in range(2):
+            self.retry_now()
+            with self.assertLogs('posts.outbox'):
+                self.dispatch()
+        self.assertTrue(OutboxEvent.objects.filter(
+            status=OutboxEvent.FAILED).exists())
+        fixed.append(True)
+        out = StringIO()
+        call_command('dispatch_outbox', once=True, requeue_failed=True,
+                     stdout=out)
+        self.assertIn('Возвращено в очередь: 1.', out.getvalue())
+        self.assertFalse(OutboxEvent.objects.exists())
@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.pagination import CursorPaginator
+from core.profiling import summarize
+from posts import urls, views
+from posts.models import Group, Post
+
+User = get_user_model()
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__),
+                            'performance_budgets.json')
+# YATUBE_UPDATE_BUDGETS=1 перезаписывает файл бюджетов текущими
+# замерами: время — с запасом TIME_HEADROOM, но не меньше MIN_TIME_MS.
+UPDATE_BUDGETS = os.getenv('YATUBE_UPDATE_BUDGETS') == '1'
+TIME_HEADROOM = 3
+MIN_TIME_MS = 100
+REPEAT = 3
+
+
+class PerformanceBudgetTest(TestCase):
+    """Число запросов и время каждой страницы posts на большой базе.
+
+    Страницы открываются с пустым кешем — это худший случай.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed', users=60, groups=5, posts=2000, comments=3000,
+                     follows=10, images=0, image_files=0, stdout=StringIO())
+        cls.author = User.objects.order_by('-stats__posts_count').first()
+        cls.reader = User.objects.annotate(
+            followed=Count('follower')).order_by('-followed').first()
+        cls.stranger = User.objects.exclude(
+            following__user=cls.reader).exclude(pk=cls.reader.pk).first()
+        cls.group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        cls.post = Post.objects.order_by('-comments_count').first()
+        cls.own_post = Post.objects.filter(author=cls.reader).first()
+        cls.comments_cursor = CursorPaginator(
+            cls.post.comments.all(), views.COMMENTS_PER_PAGE,
+            views.COMMENTS_ORDERING).get_page().next_cursor
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def requests(self):
+        """Запрос к каждой странице posts.urls: метод, url, данные."""
+        return {
+            'posts:index': ('get', reverse('posts:index'), None),
+            'posts:group_list': ('get', reverse(
+                'posts:group_list', args=(self.group.slug,)), None),
+            'posts:search': ('get', reverse('posts:search') + '?q='
+                             + self.post.text.split()[0], None),
+            'posts:profile': ('get', reverse(
+                'posts:profile', args=(self.author.username,)), None),
+            'posts:post_detail': ('get', reverse(
+                'posts:post_detail', args=(self.post.id,)), None),
+            'posts:post_create': ('get', reverse('posts:post_create'), None),
+            'posts:post_edit': ('get', reverse(
+                'posts:post_edit', args=(self.own_post.id,)), None),
+            'posts:post_comments': ('get', reverse(
+                'posts:post_comments', args=(self.post.id,)),
+                {'cursor': self.comments_cursor}),
+            'posts:add_comment': ('post', reverse(
+                'posts:add_comment', args=(self.post.id,)),
+                {'text': 'Комментарий'}),
+            'posts:follow_index': ('get', reverse('posts:follow_index'),
+                                   None),
+            'posts:profile_follow': ('get', reverse(
+                'posts:profile_follow', args=(self.stranger.username,)),
+                None),
+            'posts:profile_unfollow': ('get', reverse(
+                'posts:profile_unfollow', args=(self.stranger.username,)),
+                None),
+            'posts:export': ('get', reverse('posts:export'),
+                             {'format': 'csv'}),
+        }
+
+    def measure(self, method, url, data):
+        """Запросы первого прохода и лучшее время из REPEAT проходов."""
+        timings = []
+        queries = None
+        for _ in range(REPEAT):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.assertLess(response.status_code, 400, url)
+            if queries is None:
+                queries = [query['sql'] for query in context.captured_queries]
+        return queries, min(timings)
+
+    def test_every_view_has_request(self):
+        """Бюджет проверяется для каждой страницы posts.urls."""
+        names = {f'{urls.app_name}:{pattern.name}'
+                 for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(self.requests()))
+
+    def test_query_plans(self):
+        """Запросы страниц идут по индексам, без временных сортировок."""
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_budgets(self):
+        """Страницы укладываются в бюджеты performance_budgets.json."""
+        with open(BUDGETS_FILE, encoding='utf-8') as file:
+            budgets = json.load(file)
+        measured = {}
+        problems = []
+        for name, (method, url, data) in self.requests().items():
+            queries, elapsed = self.measure(method, url, data)
+            measured[name] = {
+                'queries': len(queries),
+                'time_ms': max(MIN_TIME_MS,
+                               int(round(elapsed * TIME_HEADROOM, -1))),
+            }
+            budget = budgets.get(name)
+            if budget is None:
+                problems.append(f'  {name}: нет бюджета')
+                continue
+            extra = len(queries) - budget['queries']
+            if extra > 0:
+                problems.append(f'  {name}: запросов {len(queries)} > '
+                                f'{budget["queries"]} (+{extra})')
+                # Повторы запроса — почти всегда N+1.
+                problems.extend(
+                    f'      {item["count"]} × {item["sql"]}'
+                    for item in summarize([(sql, 0) for sql in queries],
+                                          2)['duplicates'])
+            if elapsed > budget['time_ms']:
+                problems.append(f'  {name}: время {elapsed:.0f} мс > '
+                                f'{budget["time_ms"]} мс')
+        if UPDATE_BUDGETS:
+            with open(BUDGETS_FILE, 'w', encoding='utf-8') as file:
+                json.dump(measured, file, indent=4, sort_keys=True)
+                file.write('\n')
+            return
+        if problems:
+            self.fail('\n'.join(
+                ['Превышены бюджеты страниц (performance_budgets.json):']
+                + problems
+                + ['Если рост оправдан, обновите бюджеты: '
+                   'YATUBE_UPDATE_BUDGETS=1 python manage.py test '
+                   'posts.tests.test_performance']))
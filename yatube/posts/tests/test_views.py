@@ -1,16 +1,32 @@
+import base64
+import csv
+import json
+import os
 import shutil
 import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 import constants as c
-from posts.models import Follow, Group, Post
+from core.cache import get_stats, get_versions
+from core.models import Job
+from core.tests.utils import RunOnCommitMixin
+from posts import cache as cache_module
+from posts import search, thumbnails, views
+from posts.cache import CARD_STATS
+from posts.models import (Comment, Follow, Group, Post, SearchEntry,
+                          ThumbnailJob, TimelineEntry)
 
 User = get_user_model()
 
@@ -235,8 +251,57 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(
                 len(response.context.get('page_obj').object_list), 3)
 
-
-class CacheTests(TestCase):
+    def test_page_past_end_returns_last_page(self):
+        """Номер за концом ленты, как в Paginator, даёт последнюю страницу."""
+        response = self.client.get(reverse('posts:index'), {'page': 99})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj.object_list), 3)
+        self.assertFalse(page_obj.has_next())
+
+    def test_cursor_pages_follow_each_other(self):
+        """Курсоры ведут на соседние страницы без пропусков и повторов."""
+        url = reverse('posts:index')
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page.object_list), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            {post.id for post in first_page}
+            | {post.id for post in second_page},
+            set(Post.objects.values_list('id', flat=True)))
+        previous_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), c.POSTS_PER_PAGE)
+
+    def test_malformed_page_and_cursor(self):
+        """Огромный номер страницы и курсоры с чужими значениями
+        не приводят к ошибке сервера."""
+        post = Post.objects.first()
+        date = post.pub_date.isoformat()
+        params = [{'page': '100000000000000000000'}] + [
+            {'cursor': base64.urlsafe_b64encode(
+                json.dumps(['n', 2, *values]).encode()).decode()}
+            for values in ([date, 'abc'], [date, [1]], [date, 10 ** 30],
+                           ['2020-13-45T00:00:00', post.id], [None, post.id],
+                           [12345, post.id])]
+        urls = (reverse('posts:index'), reverse('api:index'),
+                reverse('posts:post_comments', args=(post.id,)))
+        for url in urls:
+            for query in params:
+                with self.subTest(url=url, query=query):
+                    response = self.client.get(url, query)
+                    self.assertEqual(response.status_code, 200)
+
+
+class CacheTests(RunOnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -253,19 +318,226 @@ class CacheTests(TestCase):
         self.authorized_client.force_login(self.user)
 
     def test_cache_index(self):
-        """Тест кэширования страницы index.html"""
+        """Главная страница берётся из кеша, пока посты не менялись."""
+        cache.clear()
         first_response = self.authorized_client.get(reverse('posts:index'))
-        post_object = Post.objects.get(id=self.post.id)
-        post_object.text = c.POST_TEXT_NEW
-        post_object.save()
+        # update() не вызывает сигналов: кеш не сбрасывается.
+        Post.objects.filter(id=self.post.id).update(text=c.POST_TEXT_NEW)
         second_response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first_response.content, second_response.content)
         cache.clear()
         third_response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_response.content, third_response.content)
 
-
-class FollowTests(TestCase):
+    def test_feeds_invalidated_on_post_change(self):
+        """Изменение поста сразу видно во всех лентах, где он показан."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.post.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.post.text = c.POST_TEXT_NEW
+        self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.authorized_client.get(url),
+                                    c.POST_TEXT_NEW)
+
+    def test_comment_bumps_one_author_version(self):
+        """Комментарий не перебирает подписчиков автора: меняется одна
+        версия корзины автора, которая входит в ключ ленты подписок."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        follow_key = cache_module.FOLLOW_FEED_VERSION.format(self.user.pk)
+        author_key = cache_module.author_feed_version(self.post.author_id)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        before = get_versions([follow_key, author_key])
+        Comment.objects.create(post=self.post, author=self.user,
+                               text=c.COMMENT_TEXT)
+        after = get_versions([follow_key, author_key])
+        self.assertEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:follow_index')),
+            'Комментариев: 1')
+
+    def test_many_follows_keep_feed_key_bounded(self):
+        """Сколько бы ни было подписок, ключ ленты подписок короткий,
+        а ключей версий не больше числа корзин."""
+        for index in range(100):
+            author = User.objects.create_user(username=f'автор {index}')
+            Follow.objects.create(user=self.user, author=author)
+        Follow.objects.create(user=self.user, author=self.post.author)
+        keys = cache_module.follow_feed_version_keys(self.user)
+        self.assertLessEqual(len(keys),
+                             cache_module.AUTHOR_VERSION_BUCKETS + 1)
+        with mock.patch.object(cache_module.cache, 'set',
+                               wraps=cache_module.cache.set) as cache_set:
+            self.authorized_client.get(reverse('posts:follow_index'))
+        for call in cache_set.call_args_list:
+            self.assertLess(len(call.args[0]), 250)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text=c.COMMENT_TEXT)
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:follow_index')),
+            'Комментариев: 1')
+
+    def test_user_edits_keep_unrelated_cards(self):
+        """Смена пароля не сбрасывает карточки и ленты, а новое имя
+        автора сразу видно в его карточках."""
+        cache.clear()
+        author = User.objects.get(pk=self.post.author_id)
+        self.guest_client.get(reverse('posts:index'))
+        author.set_password('new-password')
+        author.save()
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse('posts:index'))
+        author.first_name = 'Переименованный'
+        author.save()
+        self.assertContains(self.guest_client.get(reverse('posts:index')),
+                            'Переименованный')
+        self.assertEqual(get_stats(CARD_STATS), (0, 2))
+
+    def test_post_card_cache(self):
+        """Карточка поста переиспользуется разными лентами,
+        пока пост не изменился."""
+        cache.clear()
+        url = reverse('posts:profile', kwargs={'username': self.post.author})
+        self.guest_client.get(url)
+        self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(get_stats(CARD_STATS), (1, 1))
+        self.post.text = c.POST_TEXT_NEW
+        self.post.save()
+        response = self.guest_client.get(url)
+        self.assertContains(response, c.POST_TEXT_NEW)
+        self.assertEqual(get_stats(CARD_STATS), (1, 2))
+
+    def test_page_cards_in_one_round_trip(self):
+        """Карточки страницы читаются из кеша одним get_many."""
+        posts = [Post.objects.create(author=self.user, text=c.POST_TEXT)
+                 for _ in range(3)]
+        cards = cache_module.render_cards(posts)
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many:
+            self.assertEqual(cache_module.render_cards(posts), cards)
+        # Версии и карточки.
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_anonymous_fast_path(self):
+        """Аноним без cookie получает общую ленту из кеша без запросов
+        к базе и с заголовками для прокси."""
+        cache.clear()
+        group = Group.objects.create(title=c.GROUP_TITLE, slug=c.GROUP_SLUG,
+                                     description=c.GROUP_DESCRIPTION)
+        post = Post.objects.create(author=self.user, group=group,
+                                   text=c.POST_TEXT)
+        url = reverse('posts:group_list', kwargs={'slug': c.GROUP_SLUG})
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertContains(response, c.POST_TEXT)
+        self.assertIsNone(response.context)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        not_modified = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        post.text = c.POST_TEXT_NEW
+        post.save()
+        self.assertContains(self.guest_client.get(url), c.POST_TEXT_NEW)
+
+    def test_fast_path_skipped_with_cookie(self):
+        """Запрос с cookie и страница вошедшего идут обычным путём."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.cookies['theme'] = 'dark'
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn('Cache-Control', response)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, c.USERNAME_NEW)
+        self.assertNotIn('Cache-Control', response)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.group = Group.objects.create(
+            title=c.GROUP_TITLE, slug=c.GROUP_SLUG,
+            description=c.GROUP_DESCRIPTION)
+        self.post = Post.objects.create(author=self.user, group=self.group,
+                                        text=c.POST_TEXT)
+        self.client = Client()
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 без основных запросов,
+        изменение поста, группы или автора даёт новую страницу."""
+        pages = (
+            (reverse('posts:post_detail', args=(self.post.id,)), 1,
+             lambda: Comment.objects.create(post=self.post, author=self.user,
+                                            text=c.COMMENT_TEXT)),
+            (reverse('posts:group_list', args=(c.GROUP_SLUG,)), 0,
+             lambda: Post.objects.create(author=self.user, group=self.group,
+                                         text=c.POST_TEXT_NEW)),
+            (reverse('posts:profile', args=(c.USERNAME_AUTHOR,)), 0,
+             lambda: Post.objects.create(author=self.user,
+                                         text=c.POST_TEXT_NEW)),
+        )
+        for url, queries, change in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_relogin_gets_fresh_csrf_token(self):
+        """После повторного входа страница поста не отдаётся по старому
+        ETag, и комментарий с её CSRF-токеном принимается."""
+        self.user.set_password(c.PASSWORD)
+        self.user.save()
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('posts:post_detail', args=(self.post.id,))
+
+        def login():
+            token = client.get(reverse('users:login')).context['csrf_token']
+            client.post(reverse('users:login'), {
+                'username': c.USERNAME_AUTHOR, 'password': c.PASSWORD,
+                'csrfmiddlewaretoken': str(token)})
+
+        login()
+        response = client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         304)
+        client.get(reverse('users:logout'))
+        login()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': c.COMMENT_TEXT,
+             'csrfmiddlewaretoken': str(response.context['csrf_token'])})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(text=c.COMMENT_TEXT).exists())
+
+    def test_etag_depends_on_user(self):
+        """Вошедший пользователь не получает страницу гостя."""
+        url = reverse('posts:profile', args=(c.USERNAME_AUTHOR,))
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+
+
+class FollowTests(RunOnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -322,3 +594,348 @@ class FollowTests(TestCase):
         response_not_follow = self.auth_client_following.get(
             reverse('posts:follow_index'))
         self.assertNotContains(response_not_follow, c.POST_TEXT)
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков,
+        а после отписки исчезает из ленты."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        new_post = Post.objects.create(author=self.user_following,
+                                       text=c.POST_TEXT_NEW)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=new_post).exists())
+        response = self.auth_client_follower.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        Follow.objects.filter(user=self.user_follower).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_read_at_query_time(self):
+        """Посты популярного автора не раскладываются по лентам,
+        но попадают в ленту подписчика при чтении."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        new_post = Post.objects.create(author=self.user_following,
+                                       text=c.POST_TEXT_NEW)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists())
+        response = self.auth_client_follower.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_author_crosses_fanout_limit(self):
+        """Пост, написанный автором выше порога раскладки, остаётся
+        в ленте подписчика, когда автор опускается ниже порога."""
+        Follow.objects.create(user=self.user_follower,
+                              author=self.user_following)
+        other = User.objects.create_user(username='second_follower')
+        Follow.objects.create(user=other, author=self.user_following)
+        popular_post = Post.objects.create(author=self.user_following,
+                                           text=c.POST_TEXT_NEW)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post=popular_post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=popular_post).exists())
+        response = self.auth_client_follower.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [popular_post, self.post])
+        Follow.objects.create(user=other, author=self.user_following)
+        # Лента подписчика не менялась и берётся из кеша; проверяем
+        # её сборку заново.
+        cache.clear()
+        response = self.auth_client_follower.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [popular_post, self.post])
+
+
+class SearchTests(RunOnCommitMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.client = Client()
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.id for post in response.context['page_obj']]
+
+    def check_search(self):
+        in_text = Post.objects.create(author=self.user,
+                                      text='Ёлки зелёные в лесу')
+        in_comment = Post.objects.create(author=self.user, text='Прогулка')
+        Comment.objects.create(post=in_comment, author=self.user,
+                               text='Видели ёлки?')
+        other = Post.objects.create(author=self.user, text='Про море')
+        self.assertEqual(self.search('ёлки'), [in_text.id, in_comment.id])
+        self.assertEqual(self.search('ЁЛКИ лесу'), [in_text.id])
+        self.assertEqual(self.search('кактус'), [])
+        other.text = 'Ёлки у моря'
+        other.save()
+        in_text.delete()
+        self.assertEqual(self.search('ёлки'), [other.id, in_comment.id])
+
+    def test_search_fts(self):
+        """Поиск через FTS5 находит посты по тексту и комментариям."""
+        self.check_search()
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_search_inverted_index(self):
+        """Обратный индекс даёт те же результаты, что и FTS5."""
+        self.check_search()
+
+    def check_comment_deltas(self):
+        post = Post.objects.create(author=self.user, text='Прогулка')
+        other = Post.objects.create(author=self.user, text='Про море')
+        with mock.patch.object(search, '_comments_text',
+                               side_effect=AssertionError):
+            first = Comment.objects.create(post=post, author=self.user,
+                                           text='ёлки-палки')
+            second = Comment.objects.create(post=post, author=self.user,
+                                            text='палки')
+            Comment.objects.create(post=other, author=self.user,
+                                   text='ёлки')
+            self.assertEqual(self.search('палки'), [post.id])
+            first.delete()
+            self.assertEqual(self.search('палки'), [post.id])
+            self.assertEqual(self.search('ёлки'), [other.id])
+            second.text = 'ёлки'
+            second.save()
+            self.assertEqual(self.search('палки'), [])
+            self.assertCountEqual(self.search('ёлки'), [other.id, post.id])
+        post.delete()
+        self.assertEqual(self.search('ёлки'), [other.id])
+
+    def test_comment_deltas_fts(self):
+        """Комментарий меняет индекс FTS5, не перечитывая остальные."""
+        self.check_comment_deltas()
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_comment_deltas_inverted_index(self):
+        """Комментарий меняет только веса своих слов."""
+        self.check_comment_deltas()
+        self.assertFalse(SearchEntry.objects.filter(weight__lte=0).exists())
+
+    def test_search_paginated(self):
+        """Результаты поиска разбиты на страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}')
+            for number in range(c.POSTS_PER_PAGE + 3))
+        search.rebuild()
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'пост', 'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         c.POSTS_PER_PAGE + 3)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class CommentsPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.post = Post.objects.create(author=self.user, text=c.POST_TEXT)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user,
+                    text=f'Комментарий {number}')
+            for number in range(views.COMMENTS_PER_PAGE + 5))
+        self.client = Client()
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_comments_paginated(self):
+        """На странице поста первая страница комментариев, следующие
+        отдаёт фрагмент по курсору."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        first_page = response.context['comments_page']
+        self.assertEqual(
+            self.texts(first_page),
+            [f'Комментарий {number}'
+             for number in range(views.COMMENTS_PER_PAGE)])
+        self.assertContains(response, 'data-fragment=')
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,)),
+            {'cursor': first_page.next_cursor})
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            self.texts(response.context['comments_page']),
+            [f'Комментарий {number}'
+             for number in range(views.COMMENTS_PER_PAGE,
+                                 views.COMMENTS_PER_PAGE + 5)])
+        self.assertNotContains(response, 'data-fragment=')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.author = User.objects.create_user(
+            username=c.USERNAME_NOT_AUTHOR)
+        self.group = Group.objects.create(
+            title=c.GROUP_TITLE, slug=c.GROUP_SLUG,
+            description=c.GROUP_DESCRIPTION)
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text=c.POST_TEXT,
+            image=SimpleUploadedFile('export.gif', c.SMALL_GIF,
+                                     content_type='image/gif'))
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.user, text=c.COMMENT_TEXT)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': export_format})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def expected_rows(self):
+        return json.loads(json.dumps([
+            {'type': 'post', 'id': self.post.id, 'text': c.POST_TEXT,
+             'pub_date': self.post.pub_date,
+             'group': c.GROUP_SLUG, 'image': self.post.image.name,
+             'comments_count': 1},
+            {'type': 'comment', 'id': self.comment.id, 'post': self.post.id,
+             'text': c.COMMENT_TEXT,
+             'pub_date': self.comment.pub_date},
+            {'type': 'follow', 'author': c.USERNAME_NOT_AUTHOR},
+        ], cls=DjangoJSONEncoder))
+
+    def test_export_ndjson(self):
+        """NDJSON: пост, комментарий и подписка по строке на запись."""
+        lines = self.export('ndjson').decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         self.expected_rows())
+
+    def test_export_csv(self):
+        """CSV: одна таблица, вид записи — в колонке type."""
+        rows = list(csv.DictReader(
+            StringIO(self.export('csv').decode())))
+        self.assertEqual([row['type'] for row in rows],
+                         ['post', 'comment', 'follow'])
+        self.assertEqual(rows[0]['text'], c.POST_TEXT)
+        self.assertEqual(rows[2]['author'], c.USERNAME_NOT_AUTHOR)
+
+    def test_export_zip(self):
+        """Zip содержит data.ndjson и картинки постов."""
+        with zipfile.ZipFile(BytesIO(self.export('zip'))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ['data.ndjson',
+                 f'images/{os.path.basename(self.post.image.name)}'])
+            self.assertEqual(
+                archive.read(archive.namelist()[1]), c.SMALL_GIF)
+            lines = archive.read('data.ndjson').decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_export_errors(self):
+        """Без входа — редирект, неизвестный формат — 404."""
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+        self.client.logout()
+        response = self.client.get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_command(self):
+        """export_user_data пишет то же, что и страница выгрузки."""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'export.ndjson')
+        call_command('export_user_data', c.USERNAME_AUTHOR, output=path)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), self.export('ndjson'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=c.USERNAME_AUTHOR)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_posts_found_by_image_index(self):
+        """Готовая миниатюра находит посты своей картинки по индексу."""
+        plan = Post.objects.filter(image='posts/thumb.gif').explain()
+        self.assertIn('post_image', plan)
+
+    def test_thumbnail_generated_in_background(self):
+        """До готовности миниатюр лента показывает оригинал,
+        затем — варианты разной ширины в srcset."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': c.POST_TEXT,
+            'image': SimpleUploadedFile('thumb.gif', c.SMALL_GIF,
+                                        content_type='image/gif'),
+        })
+        post = Post.objects.get()
+        jobs = ThumbnailJob.objects.filter(source=post.image.name)
+        self.assertEqual(
+            jobs.filter(status=ThumbnailJob.PENDING).count(),
+            len(thumbnails.THUMBNAIL_SIZES))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, 'srcset=')
+        for job in jobs:
+            self.assertTrue(thumbnails.run_job(job.id))
+        self.assertFalse(jobs.exclude(status=ThumbnailJob.DONE).exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, 'src="/media/cache/')
+        for width in thumbnails.IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+
+    @override_settings(THUMBNAIL_QUEUE='threads')
+    def test_request_does_not_wait_for_thumbnails(self):
+        """Задачи запроса передаются пулу после ответа без ожидания."""
+        executor = mock.Mock()
+        with mock.patch.object(thumbnails, '_get_executor',
+                               return_value=executor):
+            thumbnails.start_request()
+            thumbnails._submit(1)
+            executor.submit.assert_not_called()
+            thumbnails.finish_request()
+        executor.submit.assert_called_once_with(
+            thumbnails._run_in_thread, 1)
+
+    @override_settings(THUMBNAIL_QUEUE='jobs')
+    def test_thumbnail_jobs_queue(self):
+        """С THUMBNAIL_QUEUE='jobs' миниатюры создают воркеры core.jobs."""
+        post = Post.objects.create(
+            author=self.user, text=c.POST_TEXT,
+            image=SimpleUploadedFile('queued.gif', c.SMALL_GIF,
+                                     content_type='image/gif'))
+        thumbnails.enqueue_post(post)
+        self.assertEqual(Job.objects.count(), len(thumbnails.THUMBNAIL_SIZES))
+        call_command('run_workers', processes=1, burst=True,
+                     stdout=StringIO())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            ThumbnailJob.objects.filter(source=post.image.name,
+                                        status=ThumbnailJob.DONE).count(),
+            len(thumbnails.THUMBNAIL_SIZES))
+
+    def test_warm_thumbnails(self):
+        """warm_thumbnails создаёт миниатюры для всех картинок."""
+        post = Post.objects.create(
+            author=self.user, text=c.POST_TEXT,
+            image=SimpleUploadedFile('warm.gif', c.SMALL_GIF,
+                                     content_type='image/gif'))
+        call_command('warm_thumbnails', processes=1, stdout=StringIO())
+        self.assertEqual(
+            ThumbnailJob.objects.filter(source=post.image.name,
+                                        status=ThumbnailJob.DONE).count(),
+            len(thumbnails.THUMBNAIL_SIZES))
@@ -0,0 +1,278 @@
+"""Фоновое создание миниатюр картинок постов.
+
+Шаблоны не создают миниатюры в запросе: ``QueuedThumbnailBackend``
+на промахе ставит задачу ``ThumbnailJob`` в очередь и отдаёт
+оригинал картинки. Задачи запроса передаются пулу потоков уже после
+отправки ответа, воркер сервера их не ждёт; при
+``THUMBNAIL_QUEUE = 'jobs'`` их выполняют воркеры ``core.jobs``,
+а при ``'inline'`` — сам поток запроса после ответа.
+Готовая миниатюра сбрасывает кеш карточек поста.
+``manage.py warm_thumbnails`` создаёт все миниатюры заранее.
+
+Каждая картинка хранится в нескольких ширинах (и в WebP, если Pillow
+собран с его поддержкой), шаблоны перечисляют их в ``srcset``.
+"""
+import json
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from PIL import Image, features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.engines.pil_engine import Engine
+from sorl.thumbnail.images import ImageFile
+
+from core import jobs
+
+from . import cache
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+# Ширины вариантов картинки поста; пропорции — как у кадра 960x339.
+IMAGE_WIDTHS = (360, 720, 960)
+IMAGE_RATIO = 339 / 960
+IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+# None — формат оригинала.
+IMAGE_FORMATS = (None, 'WEBP') if features.check('webp') else (None,)
+# Через reducing_gap Pillow сначала уменьшает картинку в целое
+# число раз (reduce), и лишь потом точно масштабирует.
+REDUCING_GAP = 3.0
+
+
+def _variant_options(image_format):
+    if image_format is None:
+        return dict(IMAGE_OPTIONS)
+    return {**IMAGE_OPTIONS, 'format': image_format}
+
+
+def variant_geometry(width):
+    return f'{width}x{round(width * IMAGE_RATIO)}'
+
+
+# Все миниатюры, которые запрашивают шаблоны постов.
+THUMBNAIL_SIZES = tuple(
+    (variant_geometry(width), _variant_options(image_format))
+    for image_format in IMAGE_FORMATS
+    for width in IMAGE_WIDTHS
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_request_jobs = threading.local()
+
+
+class DraftEngine(Engine):
+    """PIL-движок sorl, экономящий память на больших картинках.
+
+    JPEG декодируется сразу в уменьшенном в 2–8 раз масштабе
+    (``Image.draft``), поэтому полный растр большой фотографии
+    не попадает в память.
+    """
+
+    def create(self, image, geometry, options):
+        if image.format == 'JPEG':
+            width, height = (value or 0 for value in geometry)
+            source_width, source_height = image.size
+            # Берём наибольший из масштабов для обеих ориентаций:
+            # EXIF-поворот применяется уже после декодирования.
+            factor = max(width / source_width, height / source_height,
+                         width / source_height, height / source_width)
+            if factor < 1:
+                image.draft(image.mode, (math.ceil(source_width * factor),
+                                         math.ceil(source_height * factor)))
+        return super().create(image, geometry, options)
+
+    def _scale(self, image, width, height):
+        return image.resize((width, height), resample=Image.LANCZOS,
+                            reducing_gap=REDUCING_GAP)
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    """Отдаёт готовую миниатюру или оригинал, пока миниатюры нет."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        source = ImageFile(file_)
+        thumbnail = ImageFile(
+            self._get_thumbnail_filename(
+                source, geometry_string, self._full_options(source, options)),
+            default.storage)
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        enqueue(source.name, geometry_string, options)
+        return source
+
+    def generate(self, file_, geometry_string, **options):
+        """Создаёт миниатюру сразу, как стандартный бэкенд sorl."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _full_options(self, source, options):
+        # Те же значения по умолчанию, что и в ThumbnailBackend: от них
+        # зависит имя файла миниатюры.
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_QUEUE_WORKERS', 2),
+                thread_name_prefix='thumbnails')
+    return _executor
+
+
+def start_request():
+    _request_jobs.job_ids = []
+
+
+def finish_request():
+    """Передаёт пулу задачи, поставленные во время запроса.
+
+    Вызывается после отправки ответа, поэтому потоки пула не пишут
+    в базу одновременно с запросом. Их выполнения не ждём: воркер сразу
+    берёт следующий запрос, а параллельные записи ждут друг друга
+    за счёт WAL и ``busy_timeout``. Если потоков в процессе воркера
+    быть не должно, используйте ``THUMBNAIL_QUEUE = 'jobs'``.
+    С ``'inline'`` задачи выполняются здесь же, по очереди.
+    """
+    job_ids = getattr(_request_jobs, 'job_ids', None)
+    _request_jobs.job_ids = None
+    if not job_ids:
+        return
+    if getattr(settings, 'THUMBNAIL_QUEUE', 'threads') == 'inline':
+        for job_id in job_ids:
+            run_job(job_id)
+        return
+    executor = _get_executor()
+    for job_id in job_ids:
+        executor.submit(_run_in_thread, job_id)
+
+
+def _submit(job_id):
+    job_ids = getattr(_request_jobs, 'job_ids', None)
+    if job_ids is not None:
+        job_ids.append(job_id)
+    else:
+        _get_executor().submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # У каждого потока своё соединение с базой.
+        connections.close_all()
+
+
+def get_job(source, geometry, options):
+    fields = {'source': source, 'geometry': geometry,
+              'options': json.dumps(options, sort_keys=True)}
+    try:
+        with transaction.atomic():
+            return ThumbnailJob.objects.get_or_create(**fields)
+    except IntegrityError:
+        return ThumbnailJob.objects.get(**fields), False
+
+
+def enqueue(source, geometry, options):
+    """Ставит миниатюру в очередь, если её ещё не делают.
+
+    Задачи с ошибкой повторно не запускаются: их перезапускает
+    ``warm_thumbnails``.
+    """
+    job, created = get_job(source, geometry, options)
+    if not created:
+        if job.status != ThumbnailJob.DONE:
+            return
+        # Миниатюра была готова, но пропала из хранилища: делаем заново.
+        if not ThumbnailJob.objects.filter(
+                pk=job.pk, status=ThumbnailJob.DONE).update(
+                    status=ThumbnailJob.PENDING):
+            return
+    if getattr(settings, 'THUMBNAIL_QUEUE', 'threads') == 'jobs':
+        jobs.enqueue(run_job, args=[job.pk])
+        return
+    transaction.on_commit(partial(_submit, job.pk))
+
+
+def get_variants(image):
+    """Готовые варианты картинки: ``{формат: [(url, ширина), ...]}``.
+
+    Варианты, которые ещё в очереди, пропускаются.
+    """
+    variants = {}
+    for geometry, options in THUMBNAIL_SIZES:
+        thumbnail = default.backend.get_thumbnail(image, geometry, **options)
+        if thumbnail.name == image.name:
+            continue
+        variants.setdefault(options.get('format'), []).append(
+            (thumbnail.url, thumbnail.width))
+    return variants
+
+
+def enqueue_post(post):
+    for geometry, options in THUMBNAIL_SIZES:
+        enqueue(post.image.name, geometry, options)
+
+
+def run_job(job_id):
+    """Создаёт миниатюру задачи. Возвращает True, если она новая."""
+    job = ThumbnailJob.objects.get(pk=job_id)
+    try:
+        thumbnail = default.backend.generate(
+            job.source, job.geometry, **json.loads(job.options))
+        if not thumbnail.exists():
+            raise FileNotFoundError(f'не удалось создать {thumbnail.name}')
+    except Exception as error:
+        logger.exception('Миниатюра %s не создана', job)
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            status=ThumbnailJob.FAILED, error=str(error),
+            finished=timezone.now())
+        return False
+    if job.status == ThumbnailJob.DONE:
+        return False
+    ThumbnailJob.objects.filter(pk=job.pk).update(
+        status=ThumbnailJob.DONE, error='', finished=timezone.now())
+    # Закешированные карточки ссылаются на оригинал: перерисовываем их.
+    for post in Post.objects.filter(image=job.source).select_related(
+            'author'):
+        cache.bump_post(post.id)
+        cache.invalidate_post_feeds(post)
+    return True
+
+
+def warm(source):
+    """Создаёт все миниатюры картинки. Возвращает число новых."""
+    for geometry, options in THUMBNAIL_SIZES:
+        get_job(source, geometry, options)
+    job_ids = ThumbnailJob.objects.filter(source=source).values_list(
+        'pk', flat=True)
+    return sum(run_job(job_id) for job_id in job_ids)
+
+
+def init_worker():
+    """Инициализация процесса пула ``warm_thumbnails``."""
+    django.setup()
+    connections.close_all()
@@ -0,0 +1,135 @@
+"""Материализованная домашняя лента (follow_index).
+
+Новый пост сразу раскладывается по лентам подписчиков автора
+(fan-out on write), а чтение ленты — это диапазон по индексу
+``(user, pub_date)`` таблицы ``TimelineEntry``.
+
+Посты популярных авторов (не меньше ``TIMELINE_FANOUT_LIMIT``
+подписчиков) не раскладываются: их читают в момент запроса
+отдельной выборкой и сливают с материализованной лентой.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+FEED_ORDERING = ('-feed_date', '-feed_id')
+BATCH_SIZE = 1000
+# До стольких популярных авторов читаются отдельными выборками по индексу
+# (author, pub_date); при большем числе — одной выборкой с сортировкой.
+MAX_CELEBRITY_SOURCES = 5
+
+
+def get_fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=get_fanout_limit()).exists()
+
+
+def celebrities_followed_by(user):
+    return list(
+        UserStats.objects.filter(
+            user__in=Follow.objects.filter(user=user).values('author'),
+            followers_count__gte=get_fanout_limit())
+        .values_list('user', flat=True)
+    )
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def add_author(user_id, author_id):
+    """Заполняет ленту подписчика постами нового автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    Нужна, когда автор перестал быть популярным: посты, написанные
+    без раскладки, иначе пропали бы из лент. Уже разложенные записи
+    пропускаются.
+    """
+    tables = {model.__name__: model._meta.db_table
+              for model in (Follow, Post, TimelineEntry)}
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {tables["TimelineEntry"]} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {tables["Follow"]} follow '
+            f'JOIN {tables["Post"]} post ON post.author_id = follow.author_id '
+            f'WHERE follow.author_id = %s {suffix}', [author_id])
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Заполняет все ленты заново одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки, которая не вызывает сигналов.
+    """
+    tables = {model.__name__: model._meta.db_table
+              for model in (Follow, Post, TimelineEntry, UserStats)}
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(
+            f'INSERT INTO {tables["TimelineEntry"]} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {tables["Follow"]} follow '
+            f'JOIN {tables["Post"]} post ON post.author_id = follow.author_id '
+            f'LEFT JOIN {tables["UserStats"]} stats '
+            f'ON stats.user_id = follow.author_id '
+            f'WHERE COALESCE(stats.followers_count, 0) < %s',
+            [get_fanout_limit()])
+
+
+def feed_sources(user):
+    """Выборки, из которых собирается лента подписок пользователя."""
+    posts = Post.objects.select_related('author', 'group')
+    # Сортировка по полям TimelineEntry, а не Post: тогда лента
+    # читается по индексу (user, pub_date, post) без сортировки.
+    sources = [posts.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_id=F('timeline_entries__post'))]
+    celebrities = celebrities_followed_by(user)
+    if len(celebrities) > MAX_CELEBRITY_SOURCES:
+        celebrities = [celebrities]
+    else:
+        celebrities = [[author_id] for author_id in celebrities]
+    for author_ids in celebrities:
+        sources.append(posts.filter(author__in=author_ids).annotate(
+            feed_date=F('pub_date'), feed_id=F('id')))
+    return sources
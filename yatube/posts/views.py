@@ -1,25 +1,73 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.cache import cache_page
 
+from core.pagination import CursorPaginator, MergedCursorPaginator
+
+from . import export, search, thumbnails, timeline
+from .cache import (GROUP_FEED_VERSION, INDEX_VERSION, POST_VERSION,
+                    cache_feed, feed_condition,
+                    follow_feed_version_keys, profile_feed_version)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
 POST_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+COMMENTS_ORDERING = ('pub_date', 'id')
+
+
+def index_versions(request):
+    return [INDEX_VERSION]
+
+
+def group_versions(request, slug):
+    return [GROUP_FEED_VERSION.format(slug)]
+
+
+def profile_versions(request, username):
+    return [profile_feed_version(username)]
 
 
-def get_page(request, post_list):
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def follow_versions(request):
+    # Нужны и условному GET, и кешу ленты: читаем подписки один раз.
+    if not hasattr(request, '_follow_version_keys'):
+        request._follow_version_keys = follow_feed_version_keys(
+            request.user)
+    return request._follow_version_keys
 
 
-@cache_page(60 * 20)
+def post_versions(request, post_id):
+    # Страница поста показывает и число постов автора: оно меняется
+    # вместе с версией профиля.
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True).first()
+    if username is None:
+        return None
+    return [POST_VERSION.format(post_id),
+            profile_feed_version(username)]
+
+
+def comments_versions(request, post_id):
+    return [POST_VERSION.format(post_id)]
+
+
+def get_page(request, post_list, ordering=('-pub_date', '-id')):
+    if isinstance(post_list, (list, tuple)):
+        paginator = MergedCursorPaginator(post_list, POST_PER_PAGE, ordering)
+    else:
+        paginator = CursorPaginator(post_list, POST_PER_PAGE, ordering)
+    return paginator.get_page(cursor=request.GET.get('cursor'),
+                              number=request.GET.get('page'))
+
+
+@feed_condition(index_versions)
+@cache_feed(index_versions)
 def index(request):
     posts = Post.objects.all().select_related('author', 'group')
     page_obj = get_page(request, posts)
@@ -29,9 +77,11 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@feed_condition(group_versions)
+@cache_feed(group_versions)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
+    posts = group.posts.select_related('author', 'group')
     page_obj = get_page(request, posts)
     context = {
         'group': group,
@@ -40,10 +90,14 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_condition(profile_versions)
+@cache_feed(profile_versions)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
     user = request.user
-    page_obj = get_page(request, author.posts.all())
+    page_obj = get_page(request,
+                        author.posts.select_related('author', 'group'))
     is_following = user.is_authenticated and user.follower.filter(
         author=author).exists()
     context = {
@@ -54,28 +108,60 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.SearchResults(query), POST_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def get_comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE,
+                                COMMENTS_ORDERING)
+    return paginator.get_page(cursor=request.GET.get('cursor'))
+
+
+@feed_condition(post_versions, csrf=True)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), id=post_id)
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     form = CommentForm()
-    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments_page': get_comments_page(request, post.id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@feed_condition(comments_versions, per_user=False)
+def post_comments(request, post_id):
+    """Следующая страница комментариев — фрагмент для post_detail."""
+    context = {
+        'post_id': post_id,
+        'comments_page': get_comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None)
     if not form.is_valid():
         return render(request, 'posts/create_post.html', {'form': form})
-    post = form.save(commit=False)
-    post.author = request.user
-    post.save()
+    # Пост и его событие outbox сохраняются одной транзакцией.
+    with transaction.atomic():
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        if post.image:
+            thumbnails.enqueue_post(post)
     return redirect('posts:profile', username=request.user)
 
 
@@ -94,7 +180,10 @@ def post_edit(request, post_id):
                     instance=post)
 
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            post = form.save()
+            if post.image and 'image' in form.changed_data:
+                thumbnails.enqueue_post(post)
         return redirect('posts:post_detail', post.id)
     context = {
         'post': post,
@@ -114,14 +203,18 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
+@feed_condition(follow_versions)
+@cache_feed(follow_versions)
 def follow_index(request):
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(request, list_of_posts)
+    sources = timeline.feed_sources(request.user)
+    page_obj = get_page(request, sources if len(sources) > 1 else sources[0],
+                        ordering=timeline.FEED_ORDERING)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -132,7 +225,8 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=user, author=author)
     if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
     return redirect(reverse('posts:profile',
                     kwargs={'username': username}))
 
@@ -141,7 +235,23 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
+    # delete() сам выполняет удаление и сигналы в одной транзакции.
     is_follower = Follow.objects.filter(user=user, author=author)
     is_follower.delete()
     return redirect(reverse('posts:profile',
                     kwargs={'username': author}))
+
+
+@login_required
+def export_data(request):
+    """Выгрузка своих постов, комментариев и подписок потоком."""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        raise Http404
+    content_type, extension = export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        export.export_chunks(request.user, export_format),
+        content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.{extension}"')
+    return response
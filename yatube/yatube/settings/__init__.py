@@ -0,0 +1,20 @@
+"""Настройки проекта.
+
+Профиль выбирается переменной окружения ``YATUBE_PROFILE``:
+``dev`` (по умолчанию) — для разработки и тестов, ``prod`` — для
+развёрнутого проекта. Общие настройки — в ``base.py``.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILE = os.getenv('YATUBE_PROFILE', 'dev')
+
+if PROFILE == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif PROFILE == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль настроек YATUBE_PROFILE={PROFILE!r}: '
+        f'ожидается dev или prod.')
@@ -0,0 +1,271 @@
+"""Общие настройки профилей dev и prod."""
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'ii@6_3cz8)2k*&(k+iiu&+f926^ogn^dh(tau2uh53c-gcuyg-'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    'www.netblog.pythonanywhere.com',
+    'netblog.pythonanywhere.com',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousFeedMiddleware',
+    'core.profiling.QueryProfilingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+# PRAGMA для каждого нового соединения с SQLite (core.db):
+# WAL — читатели не ждут писателя; busy_timeout (мс) — писатель ждёт
+# блокировку вместо ошибки «database is locked»; synchronous=NORMAL
+# в режиме WAL не теряет целостность, только последние транзакции
+# при сбое питания; cache_size < 0 — размер кеша страниц в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+# STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+# LOGOUT_REDIRECT_URL = 'posts:index'
+# PASSWORD_RESET_REDIRECT_URL = 'users:password_reset_done'
+
+# Письма ставятся в очередь, а отправляет их manage.py send_queued_mail
+# через QUEUED_EMAIL_BACKEND — движок filebased.EmailBackend.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+QUEUED_EMAIL_MAX_ATTEMPTS = 5
+# указываем директорию, в которую будут складываться файлы писем
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Кеш выбирается переменной окружения YATUBE_CACHE:
+#   locmem    — память процесса (по умолчанию, для разработки и тестов);
+#   file      — файлы в YATUBE_CACHE_LOCATION (общий для воркеров одной машины);
+#   memcached — сервер memcached, нужен пакет python-memcached;
+#   redis     — redis-совместимый сервер, нужен пакет django-redis;
+#   db        — таблица в базе, создаётся `manage.py createcachetable`.
+# YATUBE_CACHE_LOCAL=1 ставит перед общим кешем небольшой LRU в памяти
+# процесса (core.cache_backends.TwoLevelCache).
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache',
+             os.path.join(BASE_DIR, 'cache')),
+    'memcached': ('django.core.cache.backends.memcached.MemcachedCache',
+                  '127.0.0.1:11211'),
+    'redis': ('django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.getenv('YATUBE_CACHE', 'locmem')]
+SHARED_CACHE = {
+    'BACKEND': CACHE_BACKEND,
+    'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', CACHE_LOCATION),
+    'TIMEOUT': 60 * 60,
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+if CACHE_BACKEND.endswith(('MemcachedCache', 'RedisCache')):
+    SHARED_CACHE['OPTIONS'] = {}
+
+if os.getenv('YATUBE_CACHE_LOCAL') == '1':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoLevelCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 500,
+                'LOCAL_TIMEOUT': 5,
+            },
+        },
+        'shared': SHARED_CACHE,
+    }
+else:
+    CACHES = {'default': SHARED_CACHE}
+
+# Авторы, у которых подписчиков не меньше этого числа, не раскладываются
+# по лентам подписчиков при публикации: их посты читаются при запросе.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Движок поиска: 'auto' — SQLite FTS5, если он доступен, иначе обратный
+# индекс в таблице SearchEntry; 'python' — всегда обратный индекс.
+# После смены движка выполните manage.py rebuild_search_index.
+SEARCH_BACKEND = os.getenv('YATUBE_SEARCH', 'auto')
+
+# Миниатюры создаются в фоне, пока их нет — показывается оригинал.
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+THUMBNAIL_ENGINE = 'posts.thumbnails.DraftEngine'
+# 'threads' — пул потоков процесса после ответа, 'jobs' — очередь
+# core.jobs (manage.py run_workers), 'inline' — сразу после ответа
+# в потоке запроса.
+THUMBNAIL_QUEUE = os.getenv('YATUBE_THUMBNAIL_QUEUE', 'threads')
+THUMBNAIL_QUEUE_WORKERS = 2
+
+# Фоновые задачи core.jobs: пауза перед первым повтором (растёт вдвое)
+# и время, после которого задача зависшего воркера снова в очереди.
+JOB_RETRY_DELAY = 10
+JOB_TIMEOUT = 10 * 60
+
+# Сессия и пользователь читаются из кеша; изменённая сессия пишется
+# в базу после ответа, если кеш общий для всех воркеров. Оба кеша —
+# мимо локального слоя TwoLevelCache: иначе выход или смена пароля
+# доходили бы до других воркеров лишь через LOCAL_TIMEOUT.
+SESSION_ENGINE = 'core.sessions'
+SESSION_WRITE_BEHIND = not CACHE_BACKEND.endswith('LocMemCache')
+SESSION_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+USER_CACHE_ALIAS = SESSION_CACHE_ALIAS
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+
+# Сколько секунд прокси и браузеры могут хранить ленту, отданную
+# анониму из кеша (posts.middleware.AnonymousFeedMiddleware).
+ANONYMOUS_FEED_MAX_AGE = 60
+
+# Поиск и ленты подписок обновляются обработчиками событий outbox.
+# События копятся в таблице и доставляются отдельным процессом
+# manage.py dispatch_outbox; с YATUBE_OUTBOX_EAGER=1 (по умолчанию
+# в профиле dev) они обрабатываются сразу после коммита, в запросе.
+OUTBOX_EAGER = os.getenv('YATUBE_OUTBOX_EAGER', '0') == '1'
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Доля запросов, для которых профилируются обращения к базе (0 — выкл.).
+QUERY_PROFILING_RATE = float(os.getenv('YATUBE_QUERY_PROFILING', '0'))
+# Столько одинаковых по форме запросов за один HTTP-запрос считается N+1.
+QUERY_PROFILING_N_PLUS_ONE = 5
+# Сколько дней хранятся профили в таблице QueryProfile.
+QUERY_PROFILING_RETENTION_DAYS = 7
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,15 @@
+"""Разработка: отладка, шаблоны перечитываются при каждом запросе."""
+import os
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+# Миниатюры запроса готовы к его завершению: следующая страница
+# runserver или теста уже видит их, а временный MEDIA_ROOT теста
+# не удаляется под работающим потоком.
+THUMBNAIL_QUEUE = os.getenv('YATUBE_THUMBNAIL_QUEUE', 'inline')
+
+# События outbox доставляются в запросе: без процесса dispatch_outbox
+# ленты подписок и поиск иначе не обновлялись бы.
+OUTBOX_EAGER = os.getenv('YATUBE_OUTBOX_EAGER', '1') == '1'
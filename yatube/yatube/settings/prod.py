@@ -0,0 +1,84 @@
+"""Развёрнутый проект: без отладки, с кешем шаблонов и постоянными
+соединениями с базой.
+
+Перед запуском выполните ``manage.py collectstatic``: статика отдаётся
+по именам с хешем содержимого из манифеста.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import (ALLOWED_HOSTS, BASE_DIR, DATABASES, STATIC_ROOT,
+                   TEMPLATES)
+
+DEBUG = False
+
+SECRET_KEY = os.getenv('YATUBE_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Задайте YATUBE_SECRET_KEY для профиля prod.')
+
+ALLOWED_HOSTS = ALLOWED_HOSTS + [
+    host for host in os.getenv('YATUBE_ALLOWED_HOSTS', '').split(',') if host]
+
+# Шаблоны компилируются один раз на процесс.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Соединение живёт CONN_MAX_AGE секунд и переиспользуется запросами;
+# перед запросом оборвавшееся соединение закрывается (core.db).
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Статика из yatube/static собирается в STATIC_ROOT с хешами в именах,
+# и её можно кешировать в браузере бессрочно.
+STATICFILES_DIRS = [STATIC_ROOT]
+STATIC_ROOT = os.getenv('YATUBE_STATIC_ROOT',
+                        os.path.join(BASE_DIR, 'staticfiles'))
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{asctime} {levelname} {process} {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler',
+                    'formatter': 'verbose'},
+    },
+    'root': {'handlers': ['console'], 'level': 'WARNING'},
+    'loggers': {
+        # Ошибки 5xx с трассировкой; 404 и прочие 4xx не пишутся.
+        'django.request': {'level': 'ERROR'},
+        'django.security': {'level': 'WARNING'},
+        'yatube.queries': {'level': 'INFO'},
+        'core': {'level': 'INFO'},
+        'posts': {'level': 'INFO'},
+    },
+}